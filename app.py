@@ -2,7 +2,7 @@ from flask import Flask, render_template
 from flask_login import LoginManager
 import os
 from datetime import datetime
-from database import db  # Import db from the separate database.py file
+from database import db, upgrade_schema  # Import db from the separate database.py file
 
 # Initialize extensions
 # db = SQLAlchemy()  # Remove this line since we're importing db from database.py
@@ -29,7 +29,15 @@ def create_app(config_name='default'):
     # Register blueprints
     from routes import register_blueprints
     register_blueprints(app)
-    
+
+    # Keep in-memory indexes and caches in sync with database writes
+    from services import availability_index, search_cache, car_ranker, reservation_engine, event_hub
+    availability_index.init_app(app)
+    search_cache.init_app(app)
+    car_ranker.init_app(app)
+    reservation_engine.init_app(app)
+    event_hub.init_app(app)
+
     # Error handlers
     @app.errorhandler(404)
     def page_not_found(e):
@@ -48,30 +56,60 @@ def create_app(config_name='default'):
         def format_datetime(datetime_obj):
             return datetime_obj.strftime('%b %d, %Y %I:%M %p')
         
-        def calculate_days(start_date, end_date):
-            delta = end_date - start_date
-            return delta.days + 1
-        
-        def calculate_total_price(daily_price, start_date, end_date):
-            days = calculate_days(start_date, end_date)
-            return days * daily_price
+        from services.pricing import rental_days, quote
         
         return dict(
             format_date=format_date,
             format_datetime=format_datetime,
-            calculate_days=calculate_days,
-            calculate_total_price=calculate_total_price
+            calculate_days=rental_days,
+            calculate_total_price=quote
         )
     
     # Create database tables
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+
+        # Messages written before conversations existed are linked to their threads once
+        from models import Message, Conversation
+        if db.session.query(Message.id).filter(Message.conversation_id.is_(None)).first():
+            Conversation.backfill()
+
+        # Cars listed before coordinates were stored are placed for radius searches
+        from models import Car
+        Car.backfill_coordinates()
+
+        from services import car_search_index, location_index, booking_expiry, job_wheel
+        from services.completion import complete_finished_bookings
+        car_search_index.init_app(app)
+        location_index.init_app(app)
+        booking_expiry.init_app(app)
+        job_wheel.add('complete_finished_bookings', app.config['BOOKING_COMPLETION_INTERVAL'], complete_finished_bookings)
+        job_wheel.init_app(app)
     
     return app
 
+def start_background_jobs(app):
+    """
+    Start the booking expiry scheduler and the recurring job wheel.
+    Only the process serving requests calls this, so scripts that create
+    the app (init_db.py, check_queries.py, ...) never start them.
+    
+    Args:
+        app: The Flask application
+    """
+    from services import booking_expiry, job_wheel
+    with app.app_context():
+        booking_expiry.start()
+        job_wheel.start()
+
 # Main entry point
 if __name__ == '__main__':
     # Determine environment from environment variable
     env = os.environ.get('FLASK_ENV', 'default')
     app = create_app(env)
+    
+    # With the debug reloader, only the child process that serves requests runs the jobs
+    if not app.config['DEBUG'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs(app)
     app.run(debug=app.config['DEBUG'])
\ No newline at end of file
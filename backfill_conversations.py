@@ -0,0 +1,14 @@
+from app import create_app, db
+from models import Conversation
+
+def backfill_conversations():
+    """Rebuild the conversations table and its unread counters from the messages table."""
+    app = create_app()
+    
+    with app.app_context():
+        print("Backfilling conversations...")
+        count = Conversation.backfill()
+        print(f"{count} conversations up to date.")
+
+if __name__ == '__main__':
+    backfill_conversations()
@@ -0,0 +1,14 @@
+from app import create_app, db
+from models import Car
+
+def backfill_coordinates():
+    """Resolve coordinates for car listings saved without them, so radius searches find them."""
+    app = create_app()
+    
+    with app.app_context():
+        print("Backfilling car coordinates...")
+        count = Car.backfill_coordinates()
+        print(f"{count} cars given coordinates.")
+
+if __name__ == '__main__':
+    backfill_coordinates()
@@ -0,0 +1,395 @@
+from app import create_app, db
+from models import Booking, Car, Conversation, Message
+from services.cache import search_cache
+from services.geo import resolve_location
+from services.pagination import keyset_filter
+from services.ranking import car_ranker
+from services.search import car_search_service
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from types import SimpleNamespace
+import base64
+import json
+import random
+import sys
+import threading
+import time
+
+# Index expected to serve each search sort mode
+SORT_INDEXES = {
+    'price_asc': 'ix_cars_price_id',
+    'price_desc': 'ix_cars_price_id',
+    'newest': 'ix_cars_created_id',
+    'mileage_asc': 'ix_cars_mileage_id',
+    'year_desc': 'ix_cars_year_id',
+}
+
+# Relevance ranking must score this many candidates within the budget (ms)
+RANKING_SAMPLE_SIZE = 5000
+RANKING_BUDGET_MS = 50
+
+# Most queries the bookings dashboard may run however many bookings it shows:
+# loading the logged-in user, then one page query per tab
+DASHBOARD_QUERY_LIMIT = 3
+
+# Indexes the inbox must search, one for each side of a conversation
+INBOX_INDEXES = ('ix_conversations_low_last', 'ix_conversations_high_last')
+
+# Index conversation history pages are read backwards from
+HISTORY_INDEX = 'ix_messages_conversation_id'
+
+# Cursor values that must be rejected with a 400, never reach the database
+BAD_CURSOR_VALUES = (10 ** 30, -10 ** 30, 2 ** 63, True, None, float('nan'), float('inf'))
+
+# Spellings of places that differ only in punctuation, case or spacing;
+# the gazetteer resolves some of them and not others
+PLACE_SPELLINGS = ('Dearborn MI', 'Dearborn, MI', 'dearborn,  mi', 'Dearborn, M.I.', 'Detroit MI', 'Detroit, MI')
+
+def explain(query):
+    """
+    Get SQLite's query plan for a query.
+
+    Args:
+        query: The query to explain
+
+    Returns:
+        List of plan step descriptions
+    """
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return [row[-1] for row in rows]
+
+def sorted_page_query(sort, cursor_values=None, dates=None, per_page=20):
+    """
+    Build the query Car.search_page runs for a sort mode.
+
+    Args:
+        sort: A key of SORT_MODES
+        cursor_values: Sort key of the previous page's last car, for a later page (optional)
+        dates: Tuple of (start_date, end_date) to search (optional)
+        per_page: The number of cars per page
+
+    Returns:
+        The page query
+    """
+    order = Car.sort_order(sort)
+    start_date, end_date = dates or (None, None)
+    query = Car.search_query(start_date=start_date, end_date=end_date)
+    if cursor_values:
+        query = query.filter(keyset_filter(order, cursor_values))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+    return query.limit(per_page + 1)
+
+def check_sort_plans():
+    """
+    Check that every sort mode reads its index in order, without sorting
+    the results in a temporary B-tree, on the first page, on later pages
+    and with a date range.
+
+    Returns:
+        True if every plan uses its index, False otherwise
+    """
+    ok = True
+    dates = (date.today() + timedelta(days=7), date.today() + timedelta(days=10))
+    sample_cursors = {
+        'price_asc': [50.0, 1],
+        'price_desc': [50.0, 1],
+        'newest': [datetime(2025, 1, 1), 1],
+        'mileage_asc': [10000.0, 1],
+        'year_desc': [2020, 1],
+    }
+
+    # Relevance is scored in memory rather than read from an index
+    for sort in SORT_INDEXES:
+        scenarios = (
+            ('first page', None, None),
+            ('later page', sample_cursors[sort], None),
+            ('with dates', None, dates),
+        )
+        for label, cursor_values, search_dates in scenarios:
+            plan = explain(sorted_page_query(sort, cursor_values, search_dates))
+            uses_index = any(SORT_INDEXES[sort] in step for step in plan)
+            sorts_in_memory = any('TEMP B-TREE' in step for step in plan)
+            passed = uses_index and not sorts_in_memory
+            ok = ok and passed
+
+            print(f"[{'OK' if passed else 'FAIL'}] sort={sort} ({label})")
+            for step in plan:
+                print(f"    {step}")
+
+    return ok
+
+def check_ranking_latency():
+    """
+    Check that relevance ranking scores a large candidate set within its
+    latency budget. Uses generated candidates so the check does not depend
+    on the size of the database.
+
+    Returns:
+        True if ranking finishes within RANKING_BUDGET_MS, False otherwise
+    """
+    generator = random.Random(0)
+    created = datetime(2025, 1, 1)
+    candidates = [
+        SimpleNamespace(
+            id=car_id,
+            daily_price=generator.uniform(20, 300),
+            year=generator.randint(2000, 2025),
+            created_at=created + timedelta(days=generator.randint(0, 365)),
+            latitude=42 + generator.uniform(-1, 1),
+            longitude=-83 + generator.uniform(-1, 1),
+            geohash=generator.choice(['dpsb', 'dpsc', 'dpsf', 'dps8']) + 'xxxx'
+        )
+        for car_id in range(1, RANKING_SAMPLE_SIZE + 1)
+    ]
+
+    started = time.perf_counter()
+    ranked = car_ranker.rank(candidates, origin=(42.33, -83.05))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    passed = len(ranked) == len(candidates) and elapsed_ms <= RANKING_BUDGET_MS
+    print(f"[{'OK' if passed else 'FAIL'}] ranking {len(candidates)} candidates took {elapsed_ms:.1f} ms (budget {RANKING_BUDGET_MS} ms)")
+    return passed
+
+def count_page_queries(app, url, user_id):
+    """
+    Request a page as a logged-in user and record the SQL it runs.
+    Only statements from this thread are recorded, so background jobs are ignored.
+
+    Args:
+        app: The Flask application
+        url: The page to request
+        user_id: The ID of the user to log in as
+
+    Returns:
+        Tuple of (response, list of SQL statements)
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    thread_id = threading.get_ident()
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread_id:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, statements
+
+def check_dashboard_queries(app):
+    """
+    Check that the bookings dashboard runs a fixed number of queries, so
+    cars, owners, renters and payments are never lazy-loaded per booking.
+    Uses the users with the most bookings as renter and as owner.
+
+    Args:
+        app: The Flask application
+
+    Returns:
+        True if every dashboard stays within DASHBOARD_QUERY_LIMIT, False otherwise
+    """
+    busiest_renter = db.session.query(Booking.renter_id).group_by(Booking.renter_id).order_by(
+        db.func.count(Booking.id).desc()
+    ).limit(1).scalar()
+    busiest_owner = db.session.query(Car.owner_id).join(Booking, Booking.car_id == Car.id).group_by(
+        Car.owner_id
+    ).order_by(db.func.count(Booking.id).desc()).limit(1).scalar()
+
+    user_ids = {user_id for user_id in (busiest_renter, busiest_owner) if user_id is not None}
+    if not user_ids:
+        print("[OK] bookings dashboard (no bookings to show)")
+        return True
+
+    ok = True
+    for user_id in sorted(user_ids):
+        response, statements = count_page_queries(app, '/bookings/bookings', user_id)
+        passed = response.status_code == 200 and len(statements) <= DASHBOARD_QUERY_LIMIT
+        ok = ok and passed
+
+        print(f"[{'OK' if passed else 'FAIL'}] bookings dashboard for user {user_id}: "
+              f"{len(statements)} queries (limit {DASHBOARD_QUERY_LIMIT}), status {response.status_code}")
+        for statement in statements:
+            print(f"    {' '.join(statement.split())[:120]}")
+
+    return ok
+
+def check_inbox_plan():
+    """
+    Check that the inbox reads only the user's own conversations through
+    the participant indexes, on the first page and on later pages, and
+    never scans the conversations or messages tables.
+
+    Returns:
+        True if both plans search the indexes, False otherwise
+    """
+    ok = True
+    scenarios = (
+        ('first page', None),
+        ('later page', 1000),
+    )
+    for label, last_id in scenarios:
+        query = Conversation.inbox_query(1)
+        if last_id is not None:
+            query = query.filter(Conversation.last_message_id < last_id)
+        plan = explain(query.order_by(Conversation.last_message_id.desc()).limit(21))
+        uses_indexes = all(any(index in step for step in plan) for index in INBOX_INDEXES)
+        scans = any(step.startswith('SCAN') for step in plan)
+        passed = uses_indexes and not scans
+        ok = ok and passed
+
+        print(f"[{'OK' if passed else 'FAIL'}] inbox ({label})")
+        for step in plan:
+            print(f"    {step}")
+
+    return ok
+
+def check_history_plan():
+    """
+    Check that a page of conversation history reads the thread backwards
+    through its index, on the first page and on later pages, without
+    sorting the whole thread in a temporary B-tree.
+
+    Returns:
+        True if both plans use the index in order, False otherwise
+    """
+    ok = True
+    scenarios = (
+        ('first page', None),
+        ('later page', 1000),
+    )
+    for label, before in scenarios:
+        # The query Message.conversation_page runs for a single thread
+        query = Message.query.filter(Message.conversation_id == 1)
+        if before is not None:
+            query = query.filter(keyset_filter([(Message.id, True)], [before]))
+        plan = explain(query.order_by(Message.id.desc()).limit(31))
+        uses_index = any(HISTORY_INDEX in step for step in plan)
+        sorts_in_memory = any('TEMP B-TREE' in step for step in plan)
+        passed = uses_index and not sorts_in_memory
+        ok = ok and passed
+
+        print(f"[{'OK' if passed else 'FAIL'}] conversation history ({label})")
+        for step in plan:
+            print(f"    {step}")
+
+    return ok
+
+def check_cache_keys():
+    """
+    Check that place spellings which resolve differently never share a
+    search cache entry, for near searches and relevance-ranked locations,
+    and that a cached search never answers one spelling with another's results.
+
+    Returns:
+        True if every spelling pair is keyed apart when it must be, False otherwise
+    """
+    ok = True
+    for name, extra in (('near', {'radius_km': 50}), ('location', {'sort': 'relevance'})):
+        keys = {}
+        for spelling in PLACE_SPELLINGS:
+            key = search_cache.make_key(search_cache.normalize(dict(extra, **{name: spelling})))
+            keys.setdefault(key, set()).add(resolve_location(spelling))
+        shared = [places for places in keys.values() if len(places) > 1]
+        ok = ok and not shared
+        print(f"[{'OK' if not shared else 'FAIL'}] cache keys for {name} spellings: "
+              f"{len(keys)} entries for {len(PLACE_SPELLINGS)} spellings")
+
+    # The same order as the reported failure: the unresolved spelling first
+    search_cache.clear()
+    unresolved = car_search_service.search({'near': 'Dearborn MI', 'radius_km': 50})
+    resolved = car_search_service.search({'near': 'Dearborn, MI', 'radius_km': 50})
+    search_cache.clear()
+    passed = bool(unresolved.errors) and not resolved.errors
+    ok = ok and passed
+    print(f"[{'OK' if passed else 'FAIL'}] near search after a cached miss: {resolved.errors or 'resolved'}")
+    return ok
+
+def make_cursor(values):
+    """
+    Encode raw JSON values as a cursor, bypassing encode_cursor's types.
+
+    Args:
+        values: List of JSON values
+
+    Returns:
+        URL-safe cursor string
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def check_cursor_bounds(app):
+    """
+    Check that cursors carrying values no sort key can hold, such as
+    integers beyond 64 bits, are rejected rather than causing a 500: with
+    a 400 from the car search and conversation history, and with the
+    first page from the inbox.
+
+    Args:
+        app: The Flask application
+
+    Returns:
+        True if every malformed cursor is rejected, False otherwise
+    """
+    client = app.test_client()
+    urls = []
+    for value in BAD_CURSOR_VALUES:
+        urls.append(f"/cars/api/cars?cursor={make_cursor([value, 1])}&sort=price_asc")
+        urls.append(f"/cars/api/cars?cursor={make_cursor([value])}")
+
+    # Message history needs a participant of an existing conversation
+    message = Message.query.order_by(Message.id).first()
+    if message is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(message.sender_id)
+            session['_fresh'] = True
+        for value in BAD_CURSOR_VALUES:
+            urls.append(f"/messages/messages/conversation/{message.receiver_id}/history?cursor={make_cursor([value])}")
+            urls.append(f"/messages/messages?cursor={make_cursor([value])}")
+
+    ok = True
+    for url in urls:
+        try:
+            status = client.get(url).status_code
+        except Exception:
+            # Errors propagate out of the test client when debugging is on
+            status = 500
+        # The inbox answers a bad cursor with its first page and a message
+        passed = status == (200 if url.startswith('/messages/messages?') else 400)
+        ok = ok and passed
+        if not passed:
+            print(f"[FAIL] {url}: status {status}")
+    print(f"[{'OK' if ok else 'FAIL'}] out-of-range cursor values rejected")
+    return ok
+
+def run_checks():
+    """
+    Run every query check against the configured database.
+
+    Returns:
+        True if all checks pass, False otherwise
+    """
+    app = create_app()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print("Query plan checks require SQLite.")
+            return False
+
+        plans_ok = check_sort_plans()
+        ranking_ok = check_ranking_latency()
+        dashboard_ok = check_dashboard_queries(app)
+        inbox_ok = check_inbox_plan()
+        history_ok = check_history_plan()
+        cache_ok = check_cache_keys()
+        cursors_ok = check_cursor_bounds(app)
+        return plans_ok and ranking_ok and dashboard_ok and inbox_ok and history_ok and cache_ok and cursors_ok
+
+if __name__ == '__main__':
+    sys.exit(0 if run_checks() else 1)
@@ -5,6 +5,57 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'driveshare_secret_key')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Number of cars per page in search results
+    CARS_PER_PAGE = 20
+    
+    # Number of bookings per page on each tab of the bookings dashboard
+    BOOKINGS_PER_PAGE = 20
+    
+    # Number of conversations per page in the message inbox
+    CONVERSATIONS_PER_PAGE = 20
+    
+    # Number of messages per page of conversation history, latest first
+    MESSAGES_PER_PAGE = 30
+    
+    # Maximum number of message IDs marked as read by one batch request
+    MESSAGE_MARK_READ_LIMIT = 500
+    
+    # Live event stream: open streams per user, undelivered events per stream
+    # and seconds between heartbeats on an idle stream
+    EVENT_MAX_SUBSCRIBERS_PER_USER = 5
+    EVENT_QUEUE_SIZE = 100
+    EVENT_HEARTBEAT_SECONDS = 15
+    
+    # Search result cache: maximum entries and seconds before an entry expires
+    SEARCH_CACHE_SIZE = 256
+    SEARCH_CACHE_TTL = 60
+    
+    # Relevance sort: weight of each signal and most candidates scored per search
+    RANKING_WEIGHTS = {'price': 0.35, 'distance': 0.30, 'year': 0.20, 'recency': 0.15}
+    RANKING_CANDIDATE_LIMIT = 2000
+    
+    # Booking reservations: retries after losing a race for the same car, and base delay in seconds
+    RESERVATION_MAX_RETRIES = 3
+    RESERVATION_RETRY_DELAY = 0.05
+    
+    # Hours a pending booking holds a car before it expires, and whether the expiry scheduler runs
+    BOOKING_HOLD_HOURS = 24
+    BOOKING_EXPIRY_ENABLED = True
+    
+    # Background jobs, and how often (seconds) and in what batch size finished bookings are completed
+    JOBS_ENABLED = True
+    BOOKING_COMPLETION_INTERVAL = 3600
+    BOOKING_COMPLETION_BATCH_SIZE = 500
+    
+    # Maximum number of checks accepted by the batch availability endpoint
+    AVAILABILITY_BATCH_LIMIT = 100
+    
+    # Maximum number of bookings updated by one bulk status change
+    BOOKING_BULK_LIMIT = 100
+    
+    # Longest date range, in days, returned by the availability calendar endpoint
+    CALENDAR_MAX_DAYS = 366
+    
     # Email configuration
     EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
     EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
@@ -22,6 +73,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
     WTF_CSRF_ENABLED = False
+    BOOKING_EXPIRY_ENABLED = False
+    JOBS_ENABLED = False
 
 class ProductionConfig(Config):
     """Production configuration."""
@@ -1,4 +1,61 @@
 from flask_sqlalchemy import SQLAlchemy
 
 # Create the SQLAlchemy instance
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+def upgrade_schema():
+    """
+    Bring an existing database up to date with the models.
+
+    db.create_all() only creates tables that are missing, so nullable columns
+    and indexes added to tables that already exist are created here.
+    """
+    inspector = db.inspect(db.engine)
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                ))
+
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+def id_table(name, ids):
+    """
+    Fill a temporary table with a set of IDs for use in a subquery.
+
+    Large ID sets worked out in Python, such as search matches, are joined
+    through this table instead of being sent as an IN list with one bound
+    parameter per ID. The table lives on the session's connection and is
+    refilled on every call, so use a different name for each set that must
+    be queried at the same time.
+
+    Args:
+        name: The name of the temporary table
+        ids: Iterable of integer IDs
+
+    Returns:
+        Select of the table's IDs, e.g. for Car.id.in_(...)
+    """
+    table = db.Table(
+        name, db.MetaData(),
+        db.Column('id', db.Integer, primary_key=True),
+        prefixes=['TEMPORARY']
+    )
+    connection = db.session.connection()
+    table.create(bind=connection, checkfirst=True)
+    connection.execute(table.delete())
+
+    rows = [{'id': value} for value in set(ids)]
+    if rows:
+        connection.execute(table.insert(), rows)
+    return db.select(table.c.id)
@@ -1,5 +1,5 @@
 from app import create_app, db
-from models import User, Car, Booking, Message, Payment
+from models import User, Car, Booking, Message, Conversation, Payment
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 
@@ -144,6 +144,7 @@ def init_db():
         
         db.session.add_all([message1, message2, message3])
         db.session.commit()
+        Conversation.backfill()
         
         print("Creating sample payment...")
         # Create sample payment
@@ -4,5 +4,7 @@ from .user import User
 from .car import Car
 from .booking import Booking
 from .message import Message
+from .conversation import Conversation
 from .payment import Payment
-from .payment_method import PaymentMethod
\ No newline at end of file
+from .payment_method import PaymentMethod
+from .job_lease import JobLease
\ No newline at end of file
@@ -5,12 +5,38 @@ from datetime import datetime
 from database import db
 from app import db
 
+# Statuses that hold a car and block overlapping bookings
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+# Status changes each party may make, by the booking's current status
+VALID_STATUS_CHANGES = {
+    'owner': {
+        'pending': ['confirmed', 'cancelled'],
+        'confirmed': ['completed', 'cancelled'],
+    },
+    'renter': {
+        'pending': ['cancelled'],
+        'confirmed': ['cancelled'],
+    }
+}
+
 class Booking(db.Model):
     """
     Model representing a car booking in the system.
     Stores information about who is renting which car and when.
     """
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Serves every availability check: car, then status, then the date range
+        db.Index('ix_bookings_car_status_dates', 'car_id', 'status', 'start_date', 'end_date'),
+        # Loads the pending bookings into the expiry scheduler at startup
+        db.Index('ix_bookings_status_created', 'status', 'created_at'),
+        # Finds confirmed bookings that have ended for the completion job
+        db.Index('ix_bookings_status_end', 'status', 'end_date'),
+        # Dashboard pages, newest first: a renter's bookings and each car's bookings
+        db.Index('ix_bookings_renter_created', 'renter_id', 'created_at', 'id'),
+        db.Index('ix_bookings_car_created', 'car_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     car_id = db.Column(db.Integer, db.ForeignKey('cars.id'), nullable=False)
@@ -72,6 +98,91 @@ class Booking(db.Model):
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
         }
 
+    @staticmethod
+    def overlaps(start_date, end_date):
+        """
+        Build the filter matching bookings that overlap a date range.
+        
+        Two inclusive ranges overlap exactly when each one starts on or
+        before the day the other ends, so a single predicate is enough.
+        
+        Args:
+            start_date: The start date of the range
+            end_date: The end date of the range
+            
+        Returns:
+            SQL expression for use in a query filter
+        """
+        return db.and_(Booking.start_date <= end_date, Booking.end_date >= start_date)
+
+    @staticmethod
+    def has_overlap(car_id, start_date, end_date):
+        """
+        Check in the database whether a car has an active booking in a date range.
+        
+        Args:
+            car_id: The ID of the car
+            start_date: The start date of the range
+            end_date: The end date of the range
+            
+        Returns:
+            True if an active booking overlaps the range, False otherwise
+        """
+        query = db.session.query(Booking.id).filter(
+            Booking.car_id == car_id,
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.overlaps(start_date, end_date)
+        )
+        return db.session.query(query.exists()).scalar()
+
+    @staticmethod
+    def dashboard_page(user_id, role, cursor=None, per_page=20):
+        """
+        Fetch one page of a user's bookings dashboard, newest bookings first.
+        
+        Each booking comes with its car, the car's owner, the renter and the
+        payment in the same query, loading only the columns the dashboard
+        shows, so rendering the page makes no further queries.
+        
+        Args:
+            user_id: The ID of the user viewing the dashboard
+            role: 'renter' for the user's own bookings, 'owner' for bookings of the user's cars
+            cursor: Cursor from the previous page (optional)
+            per_page: The number of bookings per page (default: 20)
+            
+        Returns:
+            Page of bookings with the cursor for the next page
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        # This import is placed here to avoid circular imports
+        from sqlalchemy.orm import joinedload, load_only
+        from models.car import Car
+        from models.payment import Payment
+        from models.user import User
+        from services.pagination import paginate
+        
+        query = Booking.query.options(
+            load_only(
+                Booking.id, Booking.car_id, Booking.renter_id, Booking.start_date,
+                Booking.end_date, Booking.status, Booking.created_at
+            ),
+            joinedload(Booking.car).load_only(
+                Car.id, Car.owner_id, Car.model, Car.year, Car.location, Car.daily_price
+            ).joinedload(Car.owner).load_only(User.id, User.name),
+            joinedload(Booking.renter).load_only(User.id, User.name),
+            joinedload(Booking.payment).load_only(Payment.id, Payment.booking_id, Payment.status)
+        )
+        
+        if role == 'owner':
+            owned_cars = db.select(Car.id).where(Car.owner_id == user_id)
+            query = query.filter(Booking.car_id.in_(owned_cars))
+        else:
+            query = query.filter(Booking.renter_id == user_id)
+        
+        return paginate(query, [(Booking.created_at, True), (Booking.id, True)], cursor=cursor, per_page=per_page)
+
     @staticmethod
     def create_booking(car_id, renter_id, start_date, end_date):
         """
@@ -85,37 +196,15 @@ class Booking(db.Model):
             
         Returns:
             The newly created Booking object
+            
+        Raises:
+            ValueError: If the car is already booked for the requested period
         """
-        from app import db
-        
-        # Check if the car is already booked for the requested period
-        existing_bookings = Booking.query.filter(
-            Booking.car_id == car_id,
-            Booking.status.in_(['pending', 'confirmed']),
-            db.or_(
-                db.and_(Booking.start_date <= start_date, Booking.end_date >= start_date),
-                db.and_(Booking.start_date <= end_date, Booking.end_date >= end_date),
-                db.and_(Booking.start_date >= start_date, Booking.end_date <= end_date)
-            )
-        ).all()
-        
-        if existing_bookings:
-            raise ValueError("The car is already booked for the requested period")
-        
-        # Create the booking
-        booking = Booking(
-            car_id=car_id,
-            renter_id=renter_id,
-            start_date=start_date,
-            end_date=end_date,
-            status='pending'
-        )
+        # This import is placed here to avoid circular imports
+        from services import reservation_engine
         
-        # Add to database
-        db.session.add(booking)
-        db.session.commit()
-        
-        return booking
+        # The overlap check and insert happen atomically for the car
+        return reservation_engine.reserve(car_id, renter_id, start_date, end_date)
 
     def update_status(self, new_status):
         """
@@ -125,10 +214,18 @@ class Booking(db.Model):
             new_status: The new status
         """
         from app import db
+        # This import is placed here to avoid circular imports
+        from services import search_cache
         
         valid_statuses = ['pending', 'confirmed', 'completed', 'cancelled']
         if new_status not in valid_statuses:
             raise ValueError(f"Invalid status: {new_status}")
         
+        # Only a change between holding and releasing the car affects searches
+        changes_availability = (self.status in ACTIVE_STATUSES) != (new_status in ACTIVE_STATUSES)
+        
         self.status = new_status
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+        
+        if changes_availability:
+            search_cache.invalidate_booking(self.start_date, self.end_date)
\ No newline at end of file
@@ -5,12 +5,41 @@ from datetime import datetime
 from database import db
 from app import db
 
+# Nearest-car searches widen from this radius up to the maximum (km)
+NEAREST_START_RADIUS_KM = 10
+NEAREST_MAX_RADIUS_KM = 2000
+
+# Sort modes for search results, by name and label
+SORT_MODES = {
+    'price_asc': 'Price: Low to High',
+    'price_desc': 'Price: High to Low',
+    'newest': 'Newest Listings',
+    'mileage_asc': 'Lowest Mileage',
+    'year_desc': 'Newest Model Year',
+    'relevance': 'Best Match',
+}
+
 class Car(db.Model):
     """
     Model representing a car listing in the system.
     Stores information about cars available for rental.
     """
     __tablename__ = 'cars'
+    __table_args__ = (
+        db.Index('ix_cars_availability', 'availability_start', 'availability_end'),
+        db.Index('ix_cars_geohash', 'geohash'),
+        # Range filters: price-led and year-led searches, and the location facet
+        db.Index('ix_cars_price_year_mileage', 'daily_price', 'year', 'mileage'),
+        db.Index('ix_cars_year_mileage', 'year', 'mileage'),
+        db.Index('ix_cars_location', 'location'),
+        # Owner dashboards: the cars a user lists
+        db.Index('ix_cars_owner', 'owner_id'),
+        # One index per sort mode, ending in id so keyset pages read it in order
+        db.Index('ix_cars_price_id', 'daily_price', 'id'),
+        db.Index('ix_cars_created_id', 'created_at', 'id'),
+        db.Index('ix_cars_mileage_id', 'mileage', 'id'),
+        db.Index('ix_cars_year_id', 'year', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -21,6 +50,10 @@ class Car(db.Model):
     location = db.Column(db.String(200), nullable=False)
     availability_start = db.Column(db.Date, nullable=False)
     availability_end = db.Column(db.Date, nullable=False)
+    latitude = db.Column(db.Float, nullable=True)  # Resolved from location, null if unknown
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True)
+    booking_version = db.Column(db.Integer, nullable=True, default=0)  # Bumped by every reservation and booking change, see services.availability
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -76,34 +109,183 @@ class Car(db.Model):
             'mileage': self.mileage,
             'daily_price': self.daily_price,
             'location': self.location,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'availability_start': self.availability_start.strftime('%Y-%m-%d') if self.availability_start else None,
             'availability_end': self.availability_end.strftime('%Y-%m-%d') if self.availability_end else None,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
         }
 
+    @db.validates('location')
+    def validate_location(self, key, location):
+        """
+        Resolve coordinates whenever the location is set, so every car is
+        saved with them however it was created or edited.
+        
+        Args:
+            key: The attribute name
+            location: The new location
+            
+        Returns:
+            The location, unchanged
+        """
+        self._set_coordinates(location)
+        return location
+
+    def update_coordinates(self):
+        """
+        Resolve the car's location to coordinates using the offline gazetteer.
+        Coordinates are cleared when the location is not recognised.
+        
+        Returns:
+            True if the location was resolved, False otherwise
+        """
+        return self._set_coordinates(self.location)
+
+    def _set_coordinates(self, location):
+        """
+        Set the coordinates and geohash of a location, or clear them.
+        
+        Args:
+            location: The location text
+            
+        Returns:
+            True if the location was resolved, False otherwise
+        """
+        from services.geo import resolve_location, encode_geohash
+        
+        coordinates = resolve_location(location)
+        if coordinates is None:
+            self.latitude = self.longitude = self.geohash = None
+            return False
+        
+        self.latitude, self.longitude = coordinates
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        return True
+
     @staticmethod
-    def search_available_cars(location=None, start_date=None, end_date=None):
+    def backfill_coordinates(batch_size=500):
         """
-        Search for available cars based on location and date range.
+        Resolve coordinates for cars saved without them, e.g. before the
+        coordinate columns existed. Cars are read in ID order, batch_size at
+        a time, and each batch is written with one executemany and committed.
+        Listings whose location is not recognised keep null coordinates.
+        
+        Args:
+            batch_size: The number of cars read per batch (default: 500)
+            
+        Returns:
+            Number of cars given coordinates
+        """
+        from services.geo import resolve_location, encode_geohash
+        
+        resolved = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(Car.id, Car.location, Car.updated_at).filter(
+                Car.id > last_id,
+                Car.latitude.is_(None)
+            ).order_by(Car.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            updates = []
+            for car_id, location, updated_at in rows:
+                coordinates = resolve_location(location)
+                if coordinates is not None:
+                    # updated_at is written back unchanged; resolving is not an edit
+                    updates.append({
+                        'id': car_id,
+                        'latitude': coordinates[0],
+                        'longitude': coordinates[1],
+                        'geohash': encode_geohash(*coordinates),
+                        'updated_at': updated_at,
+                    })
+            if updates:
+                db.session.execute(db.update(Car), updates)
+                db.session.commit()
+                resolved += len(updates)
+        
+        return resolved
+
+    @staticmethod
+    def has_active_booking(start_date, end_date):
+        """
+        Build an EXISTS clause matching cars with an active booking in a date range.
+        Negate it to keep only cars that are free for the whole range.
+        
+        Args:
+            start_date: The start date of the range
+            end_date: The end date of the range
+            
+        Returns:
+            SQL EXISTS expression correlated to the cars table
+        """
+        from models.booking import Booking, ACTIVE_STATUSES
+        
+        return db.exists().where(
+            Booking.car_id == Car.id,
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.overlaps(start_date, end_date)
+        )
+
+    @staticmethod
+    def search_query(location=None, start_date=None, end_date=None, keywords=None,
+                     min_price=None, max_price=None, min_year=None, max_year=None,
+                     min_mileage=None, max_mileage=None,
+                     below_price=None, below_year=None, below_mileage=None):
+        """
+        Build the query for cars matching location, keywords, date range and
+        price, year and mileage ranges. Minimum and maximum bounds are
+        inclusive; the below bounds are exclusive, matching facet buckets.
         
         Args:
             location: The pickup location (optional)
             start_date: The start date of rental (optional)
             end_date: The end date of rental (optional)
+            keywords: Words to match against model or location (optional)
+            min_price: The minimum daily price (optional)
+            max_price: The maximum daily price (optional)
+            min_year: The oldest model year (optional)
+            max_year: The newest model year (optional)
+            min_mileage: The minimum mileage (optional)
+            max_mileage: The maximum mileage (optional)
+            below_price: The exclusive upper bound on daily price (optional)
+            below_year: The exclusive upper bound on model year (optional)
+            below_mileage: The exclusive upper bound on mileage (optional)
             
         Returns:
-            List of available cars matching the criteria
+            Query of matching cars
         """
-        from app import db
-        from models.booking import Booking
+        from services import car_search_index
         
         # Start with all cars
         query = Car.query
         
         # Filter by location if provided
-        if location:
-            query = query.filter(Car.location.like(f"%{location}%"))
+        location_match = car_search_index.match(location, columns=('location',))
+        if location_match is not None:
+            query = query.filter(location_match)
+        
+        # Filter by model or location keywords if provided
+        keyword_match = car_search_index.match(keywords)
+        if keyword_match is not None:
+            query = query.filter(keyword_match)
+        
+        # Filter by price, year and mileage ranges if provided
+        for column, minimum, maximum, below in (
+            (Car.daily_price, min_price, max_price, below_price),
+            (Car.year, min_year, max_year, below_year),
+            (Car.mileage, min_mileage, max_mileage, below_mileage)
+        ):
+            if minimum is not None:
+                query = query.filter(column >= minimum)
+            if maximum is not None:
+                query = query.filter(column <= maximum)
+            if below is not None:
+                query = query.filter(column < below)
         
         # Filter by availability dates if provided
         if start_date and end_date:
@@ -112,22 +294,137 @@ class Car(db.Model):
                 Car.availability_end >= end_date
             )
             
-            # Exclude cars that are already booked for the requested period
-            booked_car_ids = db.session.query(Booking.car_id).filter(
-                Booking.status.in_(['pending', 'confirmed']),
-                db.or_(
-                    db.and_(Booking.start_date <= start_date, Booking.end_date >= start_date),
-                    db.and_(Booking.start_date <= end_date, Booking.end_date >= end_date),
-                    db.and_(Booking.start_date >= start_date, Booking.end_date <= end_date)
-                )
-            ).all()
+            # Exclude cars that are already booked for the requested period,
+            # correlated per car so the booking index answers each probe
+            query = query.filter(~Car.has_active_booking(start_date, end_date))
+        
+        return query
+
+    @staticmethod
+    def search_available_cars(location=None, start_date=None, end_date=None, keywords=None, ranked=False, **ranges):
+        """
+        Search for available cars based on location, date range and
+        price, year and mileage ranges.
+        
+        Args:
+            location: The pickup location (optional)
+            start_date: The start date of rental (optional)
+            end_date: The end date of rental (optional)
+            keywords: Words to match against model or location (optional)
+            ranked: Whether to order the cars by relevance (default: False);
+                only the newest RANKING_CANDIDATE_LIMIT matches are ranked
+            **ranges: min_x, max_x and below_x bounds for price, year
+                and mileage (optional), see search_query
+            
+        Returns:
+            List of available cars matching the criteria
+        """
+        query = Car.search_query(location, start_date, end_date, keywords, **ranges)
+        if not ranked:
+            return query.all()
+        
+        # This import is placed here to avoid circular imports
+        from services.geo import resolve_location
+        from services.ranking import car_ranker
+        
+        cars = query.order_by(Car.id.desc()).limit(car_ranker.candidate_limit).all()
+        cars_by_id = {car.id: car for car in cars}
+        origin = resolve_location(location) if location else None
+        return [cars_by_id[car_id] for car_id, _ in car_ranker.rank(cars, origin=origin)]
+
+    @staticmethod
+    def sort_order(sort=None):
+        """
+        Get the ordering for a sort mode.
+        Every ordering ends with the car ID so it is unique, and matches one
+        of the table's indexes so pages are read in index order.
+        
+        Args:
+            sort: A key of SORT_MODES, or None to order by car ID; 'relevance'
+                is scored in memory by services.ranking and also orders by car ID here
+            
+        Returns:
+            List of (column, descending) pairs
+        """
+        orders = {
+            'price_asc': [(Car.daily_price, False), (Car.id, False)],
+            'price_desc': [(Car.daily_price, True), (Car.id, True)],
+            'newest': [(Car.created_at, True), (Car.id, True)],
+            'mileage_asc': [(Car.mileage, False), (Car.id, False)],
+            'year_desc': [(Car.year, True), (Car.id, True)],
+        }
+        return orders.get(sort, [(Car.id, False)])
+
+    @staticmethod
+    def search_page(query=None, cursor=None, per_page=20, sort=None):
+        """
+        Fetch one page of search results using keyset pagination.
+        Results are ordered by car ID unless a sort mode is given, so pages
+        stay stable while new listings are added.
+        
+        Args:
+            query: A Car query, e.g. from search_query (default: all cars)
+            cursor: Cursor from the previous page (optional)
+            per_page: The number of cars per page (default: 20)
+            sort: A key of SORT_MODES (optional)
             
-            booked_car_ids = [car_id for (car_id,) in booked_car_ids]
+        Returns:
+            Page of cars with the cursor for the next page
             
-            if booked_car_ids:
-                query = query.filter(~Car.id.in_(booked_car_ids))
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        from services.pagination import paginate
         
-        return query.all()
+        if query is None:
+            query = Car.query
+        
+        return paginate(query, Car.sort_order(sort), cursor=cursor, per_page=per_page)
+
+    @staticmethod
+    def search_nearby(latitude, longitude, radius_km=None, limit=None, query=None):
+        """
+        Find cars near a point, closest first.
+        
+        With a radius, every car within it is returned. Without one, the
+        search radius starts small and doubles until `limit` cars are found.
+        Either way only cars in the geohash cells around the point are read.
+        
+        Args:
+            latitude: The latitude of the search point
+            longitude: The longitude of the search point
+            radius_km: The search radius in kilometres (optional)
+            limit: The maximum number of cars to return (optional)
+            query: A Car query to narrow down, e.g. from search_query (optional)
+            
+        Returns:
+            List of (car, distance in km) tuples sorted by distance
+        """
+        from services.geo import covering_cells, distance_km
+        
+        if query is None:
+            query = Car.query
+        
+        radius = radius_km or NEAREST_START_RADIUS_KM
+        while True:
+            cells = covering_cells(latitude, longitude, radius)
+            candidates = query.filter(db.or_(*[
+                db.and_(Car.geohash >= cell, Car.geohash < cell + '~') for cell in cells
+            ])).all()
+            
+            # Cells are larger than the circle, so drop the corners
+            results = []
+            for car in candidates:
+                distance = distance_km(latitude, longitude, car.latitude, car.longitude)
+                if distance <= radius:
+                    results.append((car, distance))
+            
+            if radius_km or (limit and len(results) >= limit) or radius >= NEAREST_MAX_RADIUS_KM:
+                break
+            radius *= 2
+        
+        results.sort(key=lambda result: (result[1], result[0].id))
+        return results[:limit] if limit else results
 
     def is_available(self, start_date, end_date):
         """
@@ -140,30 +437,89 @@ class Car(db.Model):
         Returns:
             True if the car is available, False otherwise
         """
-        from app import db
-        from models.booking import Booking
+        from services import availability_index
         
         # Check if the requested dates are within the car's availability period
         if start_date < self.availability_start or end_date > self.availability_end:
             return False
         
         # Check if there are any overlapping bookings
-        existing_bookings = Booking.query.filter(
-            Booking.car_id == self.id,
-            Booking.status.in_(['pending', 'confirmed']),
-            db.or_(
-                db.and_(Booking.start_date <= start_date, Booking.end_date >= start_date),
-                db.and_(Booking.start_date <= end_date, Booking.end_date >= end_date),
-                db.and_(Booking.start_date >= start_date, Booking.end_date <= end_date)
-            )
-        ).all()
+        return not availability_index.has_overlap(self.id, start_date, end_date)
+
+    @staticmethod
+    def check_availability_many(checks):
+        """
+        Check availability for several cars and date ranges at once, using one
+        query for the cars' availability periods and at most one for bookings.
+        
+        Args:
+            checks: List of (car_id, start_date, end_date) tuples
+            
+        Returns:
+            List with True (available), False (unavailable) or None (car not found) per check
+        """
+        from app import db
+        from services import availability_index
+        
+        car_ids = {car_id for car_id, _, _ in checks}
+        windows = {
+            car_id: (availability_start, availability_end)
+            for car_id, availability_start, availability_end in db.session.query(
+                Car.id, Car.availability_start, Car.availability_end
+            ).filter(Car.id.in_(car_ids))
+        } if car_ids else {}
+        
+        # Only ranges inside the car's availability period need a booking check
+        in_window = [
+            (car_id, start_date, end_date) for car_id, start_date, end_date in checks
+            if car_id in windows and windows[car_id][0] <= start_date and end_date <= windows[car_id][1]
+        ]
+        booked = iter(availability_index.overlaps_many(in_window))
         
-        return len(existing_bookings) == 0
+        results = []
+        for car_id, start_date, end_date in checks:
+            if car_id not in windows:
+                results.append(None)
+            elif start_date < windows[car_id][0] or end_date > windows[car_id][1]:
+                results.append(False)
+            else:
+                results.append(not next(booked))
+        return results
+
+    @staticmethod
+    def availability_calendars(car_ids, start_date, end_date):
+        """
+        Get day-by-day availability for several cars over a date range.
+        
+        Args:
+            car_ids: Iterable of car IDs
+            start_date: The first day of the range
+            end_date: The last day of the range
+            
+        Returns:
+            Dictionary mapping each existing car ID to an integer bitmap where
+            bit i is set if the car can be booked on start_date + i days
+        """
+        from app import db
+        from services import availability_index
+        
+        car_ids = set(car_ids)
+        if not car_ids:
+            return {}
+        
+        windows = {
+            car_id: (availability_start, availability_end)
+            for car_id, availability_start, availability_end in db.session.query(
+                Car.id, Car.availability_start, Car.availability_end
+            ).filter(Car.id.in_(car_ids))
+        }
+        return availability_index.calendars(windows, start_date, end_date)
 
     def update_details(self, model=None, year=None, mileage=None, daily_price=None,
                       location=None, availability_start=None, availability_end=None):
         """
-        Update the car listing details.
+        Update the car listing details. The caller commits, so the search
+        index entry can be written in the same transaction.
         
         Args:
             model: The car model (optional)
@@ -174,8 +530,6 @@ class Car(db.Model):
             availability_start: The start date of availability (optional)
             availability_end: The end date of availability (optional)
         """
-        from app import db
-        
         if model is not None:
             self.model = model
             
@@ -195,6 +549,4 @@ class Car(db.Model):
             self.availability_start = availability_start
             
         if availability_end is not None:
-            self.availability_end = availability_end
-            
-        db.session.commit()
\ No newline at end of file
+            self.availability_end = availability_end
\ No newline at end of file
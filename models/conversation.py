@@ -0,0 +1,354 @@
+# models/conversation.py
+# Conversation model storing one row per message thread with its latest message and unread counters
+
+from datetime import datetime
+from database import db
+from app import db
+from sqlalchemy.exc import IntegrityError
+
+class Conversation(db.Model):
+    """
+    Model representing a message thread between two users, optionally about a booking.
+
+    The two participants are stored in ID order (user_low_id < user_high_id)
+    with an unread counter each, so a thread is found the same way whoever
+    sends. The row is updated in the same transaction as every message sent
+    in the thread, which keeps the inbox a read of this table alone.
+    """
+    __tablename__ = 'conversations'
+    __table_args__ = (
+        # A user's threads, most recent first, whichever side of the pair they are on
+        db.Index('ix_conversations_low_last', 'user_low_id', 'last_message_id'),
+        db.Index('ix_conversations_high_last', 'user_high_id', 'last_message_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    thread_key = db.Column(db.String(64), nullable=False, unique=True)  # "low:high:booking", see key_for
+    user_low_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_high_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=True)
+    last_message_id = db.Column(db.Integer, nullable=True)
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    unread_low = db.Column(db.Integer, nullable=False, default=0)  # Unread messages received by user_low_id
+    unread_high = db.Column(db.Integer, nullable=False, default=0)  # Unread messages received by user_high_id
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __init__(self, user1_id, user2_id, booking_id=None):
+        """
+        Initialize a new conversation.
+
+        Args:
+            user1_id: The ID of one participant
+            user2_id: The ID of the other participant
+            booking_id: The ID of the related booking (optional)
+        """
+        self.user_low_id, self.user_high_id = sorted((int(user1_id), int(user2_id)))
+        self.booking_id = booking_id
+        self.thread_key = Conversation.key_for(user1_id, user2_id, booking_id)
+        self.unread_low = 0
+        self.unread_high = 0
+
+    def __repr__(self):
+        """
+        String representation of the conversation.
+
+        Returns:
+            String representation
+        """
+        return f"<Conversation {self.id} - Users {self.user_low_id} and {self.user_high_id} - Booking {self.booking_id}>"
+
+    def partner_id(self, user_id):
+        """
+        Get the other participant of the conversation.
+
+        Args:
+            user_id: The ID of one participant
+
+        Returns:
+            The ID of the other participant
+        """
+        return self.user_high_id if user_id == self.user_low_id else self.user_low_id
+
+    def unread_for(self, user_id):
+        """
+        Get the number of unread messages a participant has in the conversation.
+
+        Args:
+            user_id: The ID of the participant
+
+        Returns:
+            The unread count
+        """
+        return self.unread_low if user_id == self.user_low_id else self.unread_high
+
+    @staticmethod
+    def key_for(user1_id, user2_id, booking_id=None):
+        """
+        Build the key identifying a thread, the same whichever user is first.
+
+        Args:
+            user1_id: The ID of one participant
+            user2_id: The ID of the other participant
+            booking_id: The ID of the related booking (optional)
+
+        Returns:
+            Key string such as "3:7:12", or "3:7:" without a booking
+        """
+        low, high = sorted((int(user1_id), int(user2_id)))
+        return f"{low}:{high}:{booking_id or ''}"
+
+    @staticmethod
+    def record_message(message):
+        """
+        Add a new message to its conversation, creating the conversation if needed.
+        The message must have been flushed so it has an ID; the caller commits.
+
+        The latest message and the receiver's unread counter are set with a
+        single UPDATE so concurrent senders never lose a count.
+
+        Args:
+            message: The new Message
+
+        Returns:
+            The ID of the conversation
+        """
+        key = Conversation.key_for(message.sender_id, message.receiver_id, message.booking_id)
+        receiver_is_low = int(message.receiver_id) < int(message.sender_id)
+        unread = Conversation.unread_low if receiver_is_low else Conversation.unread_high
+        sent_at = message.created_at or datetime.utcnow()
+
+        for _ in range(2):
+            updated = Conversation.query.filter_by(thread_key=key).update({
+                Conversation.last_message_id: message.id,
+                Conversation.last_message_at: sent_at,
+                unread: unread + 1,
+            }, synchronize_session=False)
+            if updated:
+                break
+
+            # First message of the thread; another sender may create it at the same time
+            conversation = Conversation(message.sender_id, message.receiver_id, message.booking_id)
+            conversation.last_message_id = message.id
+            conversation.last_message_at = sent_at
+            if receiver_is_low:
+                conversation.unread_low = 1
+            else:
+                conversation.unread_high = 1
+            try:
+                with db.session.begin_nested():
+                    db.session.add(conversation)
+                break
+            except IntegrityError:
+                continue
+
+        conversation_id = db.session.query(Conversation.id).filter_by(thread_key=key).scalar()
+        message.conversation_id = conversation_id
+        return conversation_id
+
+    @staticmethod
+    def mark_read(conversation_id, user_id, count=None):
+        """
+        Lower a participant's unread counter after messages were marked read.
+        The caller commits.
+
+        Args:
+            conversation_id: The ID of the conversation whose messages were read
+            user_id: The ID of the participant who read them
+            count: The number of messages read (default: all of them)
+        """
+        for side, unread in (
+            (Conversation.user_low_id, Conversation.unread_low),
+            (Conversation.user_high_id, Conversation.unread_high),
+        ):
+            remaining = 0 if count is None else db.case((unread > count, unread - count), else_=0)
+            Conversation.query.filter(
+                Conversation.id == conversation_id,
+                side == user_id
+            ).update({unread: remaining}, synchronize_session=False)
+
+    @staticmethod
+    def recount_unread(conversation_ids, user_id):
+        """
+        Recompute a participant's unread counters from the messages table
+        after a bulk change. The caller commits.
+
+        Args:
+            conversation_ids: IDs of the conversations to recount
+            user_id: The ID of the participant whose counters to recount
+        """
+        # This import is placed here to avoid circular imports
+        from models.message import Message
+
+        unread_messages = db.select(db.func.count(Message.id)).where(
+            Message.conversation_id == Conversation.id,
+            Message.receiver_id == user_id,
+            Message.is_read.is_(False)
+        ).scalar_subquery()
+
+        for side, unread in (
+            (Conversation.user_low_id, Conversation.unread_low),
+            (Conversation.user_high_id, Conversation.unread_high),
+        ):
+            Conversation.query.filter(
+                Conversation.id.in_(list(conversation_ids)),
+                side == user_id
+            ).update({unread: unread_messages}, synchronize_session=False)
+
+    @staticmethod
+    def thread_ids(user1_id, user2_id, booking_id=None):
+        """
+        Build a subquery of the conversations between two users.
+
+        Args:
+            user1_id: The ID of one participant
+            user2_id: The ID of the other participant
+            booking_id: The ID of the booking (optional, default: every thread of the pair)
+
+        Returns:
+            Select of conversation IDs
+        """
+        low, high = sorted((int(user1_id), int(user2_id)))
+        threads = db.select(Conversation.id).where(
+            Conversation.user_low_id == low,
+            Conversation.user_high_id == high
+        )
+        if booking_id is not None:
+            threads = threads.where(Conversation.booking_id == booking_id)
+        return threads
+
+    @staticmethod
+    def inbox_query(user_id):
+        """
+        Build the query for a user's conversations with the partner and the
+        latest message of each joined in.
+
+        Args:
+            user_id: The ID of the user whose inbox to show
+
+        Returns:
+            Query of (Conversation, User, Message) rows
+        """
+        # This import is placed here to avoid circular imports
+        from models.message import Message
+        from models.user import User
+
+        partner_id = db.case(
+            (Conversation.user_low_id == user_id, Conversation.user_high_id),
+            else_=Conversation.user_low_id
+        )
+        return db.session.query(Conversation, User, Message).join(
+            User, User.id == partner_id
+        ).join(
+            Message, Message.id == Conversation.last_message_id
+        ).filter(
+            db.or_(Conversation.user_low_id == user_id, Conversation.user_high_id == user_id)
+        )
+
+    @staticmethod
+    def inbox_page(user_id, cursor=None, per_page=20):
+        """
+        Fetch one page of a user's conversations, most recent first.
+
+        Reads the conversations table on its (participant, last_message_id)
+        indexes and joins the partner and the latest message in the same query.
+
+        Args:
+            user_id: The ID of the user whose inbox to show
+            cursor: Cursor from the previous page (optional)
+            per_page: The number of conversations per page (default: 20)
+
+        Returns:
+            Page of {'conversation', 'user', 'last_message', 'unread_count'} dictionaries
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        # This import is placed here to avoid circular imports
+        from services.pagination import Page, decode_id_cursor, encode_cursor
+
+        query = Conversation.inbox_query(user_id)
+
+        if cursor:
+            query = query.filter(Conversation.last_message_id < decode_id_cursor(cursor))
+
+        rows = query.order_by(Conversation.last_message_id.desc()).limit(per_page + 1).all()
+
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            next_cursor = encode_cursor([rows[-1][0].last_message_id])
+
+        conversations = [
+            {
+                'conversation': conversation,
+                'user': user,
+                'last_message': message,
+                'unread_count': conversation.unread_for(user_id),
+            }
+            for conversation, user, message in rows
+        ]
+        return Page(conversations, next_cursor)
+
+    @staticmethod
+    def backfill(batch_size=500):
+        """
+        Build or rebuild the conversations from the messages table.
+        Safe to run repeatedly: every thread's latest message and unread
+        counters are recomputed, and messages are linked to their thread.
+
+        Args:
+            batch_size: The number of threads written per commit (default: 500)
+
+        Returns:
+            Number of conversations written
+        """
+        # This import is placed here to avoid circular imports
+        from models.message import Message
+
+        low = db.case((Message.sender_id < Message.receiver_id, Message.sender_id), else_=Message.receiver_id)
+        high = db.case((Message.sender_id < Message.receiver_id, Message.receiver_id), else_=Message.sender_id)
+        unread = db.and_(Message.is_read.is_(False))
+
+        threads = db.session.query(
+            low.label('low'),
+            high.label('high'),
+            Message.booking_id,
+            db.func.max(Message.id).label('last_id'),
+            db.func.sum(db.case((db.and_(unread, Message.receiver_id == low), 1), else_=0)).label('unread_low'),
+            db.func.sum(db.case((db.and_(unread, Message.receiver_id == high), 1), else_=0)).label('unread_high')
+        ).group_by(low, high, Message.booking_id).all()
+
+        for start in range(0, len(threads), batch_size):
+            batch = threads[start:start + batch_size]
+            sent_at = dict(db.session.query(Message.id, Message.created_at).filter(
+                Message.id.in_([thread.last_id for thread in batch])
+            ))
+            keys = [Conversation.key_for(thread.low, thread.high, thread.booking_id) for thread in batch]
+            existing = {conversation.thread_key: conversation for conversation in Conversation.query.filter(
+                Conversation.thread_key.in_(keys)
+            )}
+
+            for key, thread in zip(keys, batch):
+                conversation = existing.get(key)
+                if conversation is None:
+                    conversation = Conversation(thread.low, thread.high, thread.booking_id)
+                    db.session.add(conversation)
+                conversation.last_message_id = thread.last_id
+                conversation.last_message_at = sent_at[thread.last_id]
+                conversation.unread_low = thread.unread_low or 0
+                conversation.unread_high = thread.unread_high or 0
+                existing[key] = conversation
+            db.session.flush()
+
+            for key, thread in zip(keys, batch):
+                in_thread = db.or_(
+                    db.and_(Message.sender_id == thread.low, Message.receiver_id == thread.high),
+                    db.and_(Message.sender_id == thread.high, Message.receiver_id == thread.low)
+                )
+                same_booking = Message.booking_id.is_(None) if thread.booking_id is None else Message.booking_id == thread.booking_id
+                Message.query.filter(in_thread, same_booking).update(
+                    {Message.conversation_id: existing[key].id}, synchronize_session=False
+                )
+            db.session.commit()
+
+        return len(threads)
@@ -0,0 +1,92 @@
+# models/job_lease.py
+# JobLease model so a scheduled job runs in only one process at a time
+
+from datetime import datetime, timedelta
+from database import db
+from app import db
+from sqlalchemy.exc import IntegrityError
+
+class JobLease(db.Model):
+    """
+    Model representing a lease on a scheduled job.
+    The process holding an unexpired lease is the only one that runs the job.
+    """
+    __tablename__ = 'job_leases'
+
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, name, holder, expires_at):
+        """
+        Initialize a new lease.
+
+        Args:
+            name: The name of the job
+            holder: Identifier of the process holding the lease
+            expires_at: When the lease lapses
+        """
+        self.name = name
+        self.holder = holder
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        """
+        String representation of the lease.
+
+        Returns:
+            String representation
+        """
+        return f"<JobLease {self.name} - {self.holder} until {self.expires_at}>"
+
+    @staticmethod
+    def acquire(name, holder, duration):
+        """
+        Take or renew the lease on a job if no other process holds it.
+
+        Uses a single conditional UPDATE, or an INSERT for a job that has
+        never run, so two processes can never both win the same lease.
+
+        Args:
+            name: The name of the job
+            holder: Identifier of the calling process
+            duration: timedelta the lease lasts
+
+        Returns:
+            True if the caller now holds the lease, False otherwise
+        """
+        now = datetime.utcnow()
+        expires_at = now + duration
+
+        taken = JobLease.query.filter(
+            JobLease.name == name,
+            db.or_(JobLease.holder == holder, JobLease.expires_at <= now)
+        ).update({JobLease.holder: holder, JobLease.expires_at: expires_at}, synchronize_session=False)
+
+        if taken:
+            db.session.commit()
+            return True
+
+        try:
+            db.session.add(JobLease(name, holder, expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Another process holds the lease
+            db.session.rollback()
+            return False
+
+    @staticmethod
+    def release(name, holder):
+        """
+        Give up a lease early so another process can take it at once.
+        Does nothing if the caller no longer holds the lease.
+
+        Args:
+            name: The name of the job
+            holder: Identifier of the calling process
+        """
+        JobLease.query.filter_by(name=name, holder=holder).update(
+            {JobLease.expires_at: datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
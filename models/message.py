@@ -11,11 +11,19 @@ class Message(db.Model):
     Stores communication between car owners and renters.
     """
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Messages between a pair of users, and unread counts of received messages
+        db.Index('ix_messages_sender_receiver_created', 'sender_id', 'receiver_id', 'created_at'),
+        db.Index('ix_messages_receiver_read', 'receiver_id', 'is_read'),
+        # A thread's messages in sending order
+        db.Index('ix_messages_conversation_id', 'conversation_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=True)
     content = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -73,41 +81,126 @@ class Message(db.Model):
         Mark the message as read.
         """
         from app import db
+        # This import is placed here to avoid circular imports
+        from models.conversation import Conversation
+        
+        if not self.is_read and self.conversation_id is not None:
+            Conversation.mark_read(self.conversation_id, self.receiver_id, 1)
         
         self.is_read = True
         db.session.commit()
 
     @staticmethod
-    def get_conversation(user1_id, user2_id, booking_id=None):
+    def conversation_page(user1_id, user2_id, booking_id=None, cursor=None, per_page=30):
         """
-        Get the conversation between two users, optionally filtered by booking.
+        Fetch one page of the conversation between two users, optionally
+        filtered by booking, starting from the latest messages.
+        
+        Messages are read backwards through the (conversation_id, id) index,
+        which holds both directions of a thread, so only per_page + 1 rows
+        per thread are read however long the conversation is. Each page's
+        cursor leads to the messages sent before it.
         
         Args:
             user1_id: The ID of the first user
             user2_id: The ID of the second user
             booking_id: The ID of the booking (optional)
+            cursor: Cursor from the previous (newer) page (optional)
+            per_page: The number of messages per page (default: 30)
             
         Returns:
-            List of messages between the users
+            Page of messages in the order they were sent, with the cursor for older messages
+            
+        Raises:
+            ValueError: If the cursor is malformed
         """
         from app import db
+        # This import is placed here to avoid circular imports
+        from sqlalchemy.orm import joinedload, load_only
+        from models.conversation import Conversation
+        from models.user import User
+        from services.pagination import Page, decode_id_cursor, paginate
         
-        # Build the query to get messages between the two users
-        query = Message.query.filter(
-            db.or_(
-                db.and_(Message.sender_id == user1_id, Message.receiver_id == user2_id),
-                db.and_(Message.sender_id == user2_id, Message.receiver_id == user1_id)
-            )
-        )
+        before = decode_id_cursor(cursor) if cursor else None
+        
+        # Without a booking, every thread between the two users is shown
+        threads = db.session.execute(Conversation.thread_ids(user1_id, user2_id, booking_id)).scalars().all()
+        if not threads:
+            return Page([])
         
-        # If booking_id is provided, filter by booking
-        if booking_id is not None:
-            query = query.filter(Message.booking_id == booking_id)
+        def latest_ids(thread_id):
+            # The newest messages of one thread older than the cursor, read backwards from the index
+            newest = db.select(Message.id).where(Message.conversation_id == thread_id)
+            if before is not None:
+                newest = newest.where(Message.id < before)
+            return db.select(newest.order_by(Message.id.desc()).limit(per_page + 1).subquery().c.id)
         
-        # Order by creation time
-        query = query.order_by(Message.created_at)
+        # IN over several threads would sort them all, so each thread's candidates are merged instead
+        if len(threads) == 1:
+            in_threads = Message.conversation_id == threads[0]
+        else:
+            in_threads = Message.id.in_(db.union_all(*[latest_ids(thread_id) for thread_id in threads]))
         
-        return query.all()
+        query = Message.query.options(
+            joinedload(Message.sender).load_only(User.id, User.name)
+        ).filter(in_threads)
+        
+        # Message IDs grow with sending time, so the highest IDs are the latest messages
+        page = paginate(query, [(Message.id, True)], cursor=cursor, per_page=per_page)
+        return Page(list(reversed(page.items)), page.next_cursor)
+
+    @staticmethod
+    def mark_conversation_read(user_id, other_user_id, booking_id=None):
+        """
+        Mark every message a user received in a conversation as read.
+        
+        Args:
+            user_id: The ID of the user reading the conversation
+            other_user_id: The ID of the other user in the conversation
+            booking_id: The ID of the booking (optional)
+            
+        Returns:
+            Number of messages marked as read
+        """
+        # This import is placed here to avoid circular imports
+        from models.conversation import Conversation
+        
+        threads = Conversation.thread_ids(user_id, other_user_id, booking_id)
+        return Message.mark_read_where(user_id, Message.conversation_id.in_(threads))
+
+    @staticmethod
+    def mark_read_where(receiver_id, *criteria):
+        """
+        Mark a user's unread received messages matching the criteria as read.
+        
+        The messages are updated with a single UPDATE and the affected
+        conversations' unread counters recounted, all in one commit,
+        however many messages there are.
+        
+        Args:
+            receiver_id: The ID of the user who received the messages
+            *criteria: Extra filter conditions on Message
+            
+        Returns:
+            Number of messages marked as read
+        """
+        from app import db
+        # This import is placed here to avoid circular imports
+        from models.conversation import Conversation
+        
+        unread = Message.query.filter(
+            Message.receiver_id == receiver_id,
+            Message.is_read.is_(False),
+            *criteria
+        )
+        threads = [conversation_id for (conversation_id,) in unread.with_entities(Message.conversation_id).distinct()]
+        if not threads:
+            return 0
+        
+        count = unread.update({Message.is_read: True}, synchronize_session='fetch')
+        Conversation.recount_unread([conversation_id for conversation_id in threads if conversation_id is not None], receiver_id)
+        db.session.commit()
+        return count
 
     @staticmethod
     def get_unread_count(user_id):
@@ -122,6 +215,21 @@ class Message(db.Model):
         """
         return Message.query.filter_by(receiver_id=user_id, is_read=False).count()
 
+    @staticmethod
+    def publish_sent(event):
+        """
+        Publish a sent message to the live event streams of the receiver
+        and of the sender's other open pages.
+        
+        Args:
+            event: The message's to_dict(), taken before the commit so no reload is needed
+        """
+        # This import is placed here to avoid circular imports
+        from services import event_hub
+        
+        for user_id in {int(event['receiver_id']), int(event['sender_id'])}:
+            event_hub.publish(user_id, 'new_message', event)
+
     @staticmethod
     def send_message(sender_id, receiver_id, content, booking_id=None):
         """
@@ -137,6 +245,8 @@ class Message(db.Model):
             The newly created Message object
         """
         from app import db
+        # This import is placed here to avoid circular imports
+        from models.conversation import Conversation
         
         # Create the message
         message = Message(
@@ -147,11 +257,14 @@ class Message(db.Model):
             is_read=False
         )
         
-        # Add to database
+        # Add to database, updating the conversation in the same transaction
         db.session.add(message)
+        db.session.flush()
+        Conversation.record_message(message)
+        event = message.to_dict()
         db.session.commit()
         
-        # In a real application, you would trigger a notification here
-        # using the Observer pattern to notify the receiver
+        # Push the message to both users' open streams
+        Message.publish_sent(event)
         
         return message
\ No newline at end of file
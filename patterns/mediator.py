@@ -33,9 +33,9 @@ class UIMediator:
             data: Additional data for the event (optional)
         """
         if event == "search":
-            # Coordinate search-related actions
-            if "search_component" in self._components:
-                self._components["search_component"].display_results(data)
+            # Coordinate search-related actions; results go back to the
+            # component that searched, since concurrent requests share a mediator
+            sender.display_results(data)
         
         elif event == "select_car":
             # When a car is selected, update the booking component
@@ -89,6 +89,26 @@ class SearchComponent(BaseComponent):
     """
     Component for searching cars.
     """
+    def __init__(self, mediator=None):
+        """
+        Initialize the search component.
+        
+        Args:
+            mediator: The mediator instance (optional)
+        """
+        super().__init__(mediator)
+        self._results = None
+    
+    @property
+    def results(self):
+        """
+        Get the results of the last search.
+        
+        Returns:
+            SearchResults, or None if no search has run
+        """
+        return self._results
+    
     def search(self, criteria):
         """
         Search for cars based on criteria.
@@ -97,22 +117,10 @@ class SearchComponent(BaseComponent):
             criteria: The search criteria
         """
         # This import is placed here to avoid circular imports
-        from models.car import Car
-        from app import db
+        from services import car_search_service
         
         # Perform the search
-        query = db.session.query(Car)
-        
-        if 'location' in criteria and criteria['location']:
-            query = query.filter(Car.location.like(f"%{criteria['location']}%"))
-        
-        if 'start_date' in criteria and criteria['start_date']:
-            query = query.filter(Car.availability_start <= criteria['start_date'])
-        
-        if 'end_date' in criteria and criteria['end_date']:
-            query = query.filter(Car.availability_end >= criteria['end_date'])
-            
-        results = query.all()
+        results = car_search_service.search(criteria)
         
         # Notify the mediator of the search results
         self.mediator.notify(self, "search", results)
@@ -124,8 +132,8 @@ class SearchComponent(BaseComponent):
         Args:
             results: The search results
         """
-        # In a real application, this would update the UI
-        # For this simple implementation, we'll just print the results
+        # Keep the results for the view that renders them
+        self._results = results
         print(f"Displaying {len(results)} search results")
 
 # Enhanced BookingComponent in mediator.py
@@ -169,6 +177,7 @@ class BookingComponent(BaseComponent):
         from models.car import Car
         from models.user import User
         from app import db
+        from services.pricing import quote
         
         # Create the booking using the BookingManager
         booking_manager = BookingManager()
@@ -185,8 +194,7 @@ class BookingComponent(BaseComponent):
         owner = User.query.get(car.owner_id)
         
         # Calculate total price
-        days = (end_date - start_date).days + 1
-        total_price = days * car.daily_price
+        total_price = quote(car.daily_price, start_date, end_date)
         
         # Create notification subject and observers
         notification_subject = NotificationSubject()
@@ -267,6 +275,7 @@ class MessageComponent(BaseComponent):
         """
         # This import is placed here to avoid circular imports
         from models.message import Message
+        from models.conversation import Conversation
         from app import db
         
         # Create the message
@@ -278,10 +287,16 @@ class MessageComponent(BaseComponent):
             is_read=False
         )
         
-        # Save to database
+        # Save to database, updating the conversation in the same transaction
         db.session.add(message)
+        db.session.flush()
+        Conversation.record_message(message)
+        event = message.to_dict()
         db.session.commit()
         
+        # Push the message to both users' open streams
+        Message.publish_sent(event)
+        
         # Notify the mediator
         self.mediator.notify(self, "send_message")
         
@@ -1,6 +1,7 @@
 # Observer Pattern for Notification System - Enhanced with Email Support
 
 from abc import ABC, abstractmethod
+from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -366,28 +367,21 @@ class BookingManager(NotificationSubject):
             
         Returns:
             The newly created Booking object
+            
+        Raises:
+            ValueError: If the car cannot be booked for the requested period
         """
         # This import is placed here to avoid circular imports
-        from models import Booking, Car
-        from app import db
-        
-        # Create the booking (without total_price parameter)
-        booking = Booking(
-            car_id=car_id,
-            renter_id=user_id,
-            start_date=start_date,
-            end_date=end_date,
-            status="pending"
-        )
+        from models import Car
+        from services import reservation_engine
+        from services.pricing import quote
         
-        # Save to database
-        db.session.add(booking)
-        db.session.commit()
+        # Check for overlapping bookings and insert atomically for the car
+        booking = reservation_engine.reserve(car_id, user_id, start_date, end_date)
         
         # Get car details for notification (calculate total price here)
         car = Car.query.get(car_id)
-        days = (end_date - start_date).days + 1
-        total_price = days * car.daily_price
+        total_price = quote(car.daily_price, start_date, end_date)
         
         # For the notification_data, you can still include the calculated total_price
         # even though it's not stored in the database
@@ -403,8 +397,10 @@ class BookingManager(NotificationSubject):
             status: The new status
         """
         # This import is placed here to avoid circular imports
-        from models import Booking, Car, User
+        from models import Booking
+        from models.booking import ACTIVE_STATUSES
         from app import db
+        from services import search_cache
         
         # Get the booking
         booking = db.session.query(Booking).get(booking_id)
@@ -417,38 +413,175 @@ class BookingManager(NotificationSubject):
             booking.status = status
             db.session.commit()
             
-            # Get additional information for notifications
-            car = Car.query.get(booking.car_id)
-            renter = User.query.get(booking.renter_id)
+            # Only a change between holding and releasing the car affects searches
+            if (old_status in ACTIVE_STATUSES) != (status in ACTIVE_STATUSES):
+                search_cache.invalidate_booking(booking.start_date, booking.end_date)
             
-            # Calculate total price on the fly
-            days = (booking.end_date - booking.start_date).days + 1
-            total_price = days * car.daily_price
+            self.announce_status_change(booking, old_status, status)
+    
+    def announce_status_change(self, booking, old_status, status):
+        """
+        Tell the renter, and the owner where appropriate, about a committed
+        status change, through the observers and the live event stream.
+        
+        Args:
+            booking: The Booking whose status changed
+            old_status: The status before the change
+            status: The new status
+        """
+        # This import is placed here to avoid circular imports
+        from models import Car, User
+        from services import event_hub
+        from services.pricing import quote
+        
+        # Get additional information for notifications
+        car = Car.query.get(booking.car_id)
+        renter = User.query.get(booking.renter_id)
+        
+        # Push the change to the renter's and the owner's open pages
+        event = {'booking_id': booking.id, 'status': status, 'old_status': old_status, 'car_name': car.model}
+        for user_id in {booking.renter_id, car.owner_id}:
+            event_hub.publish(user_id, 'booking_status', event)
+        
+        # Calculate total price on the fly
+        total_price = quote(car.daily_price, booking.start_date, booking.end_date)
+        
+        # Create notification data
+        notification_data = {
+            'notification_type': f'booking_{status}',
+            'user_id': booking.renter_id,
+            'user_email': renter.email,
+            'booking_id': booking.id,
+            'car_name': car.model,
+            'start_date': booking.start_date.strftime('%Y-%m-%d'),
+            'end_date': booking.end_date.strftime('%Y-%m-%d'),
+            'total_price': total_price
+        }
+        
+        # If the status is 'rejected', check for a reason
+        if status == 'rejected' and hasattr(booking, 'rejection_reason'):
+            notification_data['reason'] = booking.rejection_reason
+        
+        # Notify observers 
+        self.notify(notification_data)
+        
+        # Also notify car owner about status change if appropriate
+        if status in ['cancelled'] and old_status in ['confirmed']:
+            owner = User.query.get(car.owner_id)
+            owner_notification_data = notification_data.copy()
+            owner_notification_data['user_id'] = car.owner_id
+            owner_notification_data['user_email'] = owner.email
+            owner_notification_data['renter_name'] = renter.name
+            self.notify(owner_notification_data)
+    
+    def update_booking_statuses(self, bookings, status):
+        """
+        Update the status of several bookings in one transaction and notify
+        observers once per recipient.
+        
+        The bookings should be loaded with their car, the car's owner and
+        the renter, so no further lookups are needed. Each renter gets a
+        single notification listing all of their updated bookings; owners
+        are told about confirmed bookings that were cancelled, as when
+        bookings are updated one at a time.
+        
+        The change is written with conditional UPDATEs that only match
+        bookings still in the status they were validated in. If another
+        request or the expiry job changed any of them in the meantime,
+        nothing is updated.
+        
+        Args:
+            bookings: List of Booking objects, already validated for the change
+            status: The new status
             
-            # Create notification data
-            notification_data = {
-                'notification_type': f'booking_{status}',
-                'user_id': booking.renter_id,
-                'user_email': renter.email,
+        Raises:
+            ValueError: If a booking's status changed since it was validated
+        """
+        # This import is placed here to avoid circular imports
+        from models.booking import Booking, ACTIVE_STATUSES
+        from app import db
+        from services import search_cache, event_hub, availability_index
+        from services.availability import bump_booking_versions
+        
+        if not bookings:
+            return
+        
+        # Take what the notifications need before the commit expires the loaded objects
+        changes = [
+            {
                 'booking_id': booking.id,
-                'car_name': car.model,
-                'start_date': booking.start_date.strftime('%Y-%m-%d'),
-                'end_date': booking.end_date.strftime('%Y-%m-%d'),
-                'total_price': total_price
+                'old_status': booking.status,
+                'start_date': booking.start_date,
+                'end_date': booking.end_date,
+                'car_name': booking.car.model,
+                'renter': (booking.renter_id, booking.renter.email),
+                'owner': (booking.car.owner_id, booking.car.owner.email),
             }
-            
-            # If the status is 'rejected', check for a reason
-            if status == 'rejected' and hasattr(booking, 'rejection_reason'):
-                notification_data['reason'] = booking.rejection_reason
-            
-            # Notify observers 
-            self.notify(notification_data)
-            
-            # Also notify car owner about status change if appropriate
-            if status in ['cancelled'] and old_status in ['confirmed']:
-                owner = User.query.get(car.owner_id)
-                owner_notification_data = notification_data.copy()
-                owner_notification_data['user_id'] = car.owner_id
-                owner_notification_data['user_email'] = owner.email
-                owner_notification_data['renter_name'] = renter.name
-                self.notify(owner_notification_data)
\ No newline at end of file
+            for booking in bookings
+        ]
+        
+        # One UPDATE per validated status, each matching only rows still in it
+        validated = {}
+        for change in changes:
+            validated.setdefault(change['old_status'], []).append(change['booking_id'])
+        stamp = datetime.utcnow()
+        updated = 0
+        for old_status, booking_ids in validated.items():
+            updated += db.session.query(Booking).filter(
+                Booking.id.in_(booking_ids),
+                Booking.status == old_status
+            ).update({Booking.status: status, Booking.updated_at: stamp}, synchronize_session=False)
+        
+        if updated != len(changes):
+            db.session.rollback()
+            raise ValueError("Some bookings changed status while they were being updated.")
+        
+        # Bulk updates skip the ORM events that normally refresh these
+        car_ids = {booking.car_id for booking in bookings}
+        bump_booking_versions(car_ids)
+        db.session.commit()
+        availability_index.invalidate(car_ids)
+        
+        # One invalidation covers every booking that started or stopped holding its car
+        released = [
+            change for change in changes
+            if (change['old_status'] in ACTIVE_STATUSES) != (status in ACTIVE_STATUSES)
+        ]
+        if released:
+            search_cache.invalidate_booking(
+                min(change['start_date'] for change in released),
+                max(change['end_date'] for change in released)
+            )
+        
+        # Push each change to the renter's and the owner's open pages
+        for change in changes:
+            event = {
+                'booking_id': change['booking_id'],
+                'status': status,
+                'old_status': change['old_status'],
+                'car_name': change['car_name']
+            }
+            for user_id in {change['renter'][0], change['owner'][0]}:
+                event_hub.publish(user_id, 'booking_status', event)
+        
+        # Group the bookings by the users to notify
+        renters = {}
+        owners = {}
+        for change in changes:
+            renters.setdefault(change['renter'], []).append(change)
+            if status == 'cancelled' and change['old_status'] == 'confirmed':
+                owners.setdefault(change['owner'], []).append(change)
+        
+        for recipients, subject in ((renters, 'Your bookings'), (owners, 'Bookings of your cars')):
+            for (user_id, user_email), user_changes in recipients.items():
+                lines = [
+                    f"{change['car_name']}: {change['start_date'].strftime('%Y-%m-%d')} to {change['end_date'].strftime('%Y-%m-%d')}"
+                    for change in user_changes
+                ]
+                self.notify({
+                    'notification_type': f'bookings_{status}',
+                    'user_id': user_id,
+                    'user_email': user_email,
+                    'booking_ids': [change['booking_id'] for change in user_changes],
+                    'message': f"{subject} have been {status}:\n" + '\n'.join(lines)
+                })
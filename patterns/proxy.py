@@ -184,6 +184,7 @@ class PaymentProxy(IPaymentProcessor):
         from datetime import datetime
         from models import Booking, User, Car
         from patterns.observer import NotificationSubject, EmailNotifier, AppNotifier
+        from services.pricing import quote
         
         # Get the booking
         booking = Booking.query.get(booking_id)
@@ -205,8 +206,7 @@ class PaymentProxy(IPaymentProcessor):
         notification_subject.attach(app_notifier)
         
         # Calculate total price
-        days = (booking.end_date - booking.start_date).days + 1
-        amount = days * car.daily_price
+        amount = quote(car.daily_price, booking.start_date, booking.end_date)
         
         # Prepare notification data for renter
         renter_notification_data = {
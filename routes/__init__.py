@@ -7,6 +7,7 @@ from .car import car_bp
 from .booking import booking_bp
 from .message import message_bp
 from .payment import payment_bp
+from .events import events_bp
 
 # Create main blueprint
 main_bp = Blueprint('main', __name__)
@@ -34,4 +35,5 @@ def register_blueprints(app):
     app.register_blueprint(car_bp, url_prefix='/cars')
     app.register_blueprint(booking_bp, url_prefix='/bookings')
     app.register_blueprint(message_bp, url_prefix='/messages')
-    app.register_blueprint(payment_bp, url_prefix='/payments')
\ No newline at end of file
+    app.register_blueprint(payment_bp, url_prefix='/payments')
+    app.register_blueprint(events_bp, url_prefix='/events')
\ No newline at end of file
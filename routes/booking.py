@@ -1,13 +1,15 @@
 # routes/booking.py
 # Routes for booking management (create, view, update, cancel)
 
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from sqlalchemy.orm import joinedload
 
 from app import db
 from models import Booking, Car, User, Message
-from patterns.observer import BookingManager
+from models.booking import VALID_STATUS_CHANGES
+from patterns.observer import BookingManager, EmailNotifier, AppNotifier
 from patterns.mediator import UIMediator, BookingComponent, MessageComponent
 
 # Create Blueprint
@@ -16,23 +18,46 @@ booking_bp = Blueprint('booking', __name__)
 # Create UI mediator for component communication
 ui_mediator = UIMediator()
 
+def _dashboard_page(role, cursor):
+    """
+    Fetch one page of a dashboard tab, starting over if the cursor is invalid.
+    
+    Args:
+        role: 'renter' or 'owner', see Booking.dashboard_page
+        cursor: Cursor from the previous page (optional)
+        
+    Returns:
+        Page of bookings
+    """
+    per_page = current_app.config['BOOKINGS_PER_PAGE']
+    try:
+        return Booking.dashboard_page(current_user.id, role, cursor=cursor, per_page=per_page)
+    except ValueError:
+        flash('Invalid page token.')
+        return Booking.dashboard_page(current_user.id, role, per_page=per_page)
+
 @booking_bp.route('/bookings')
 @login_required
 def list_bookings():
     """
-    Display user's bookings.
+    Display user's bookings, one page per tab.
     """
-    # Get user's bookings (as renter)
-    my_bookings = Booking.query.filter_by(renter_id=current_user.id).all()
+    rentals_cursor = request.args.get('rentals_cursor') or None
+    received_cursor = request.args.get('received_cursor') or None
     
-    # If user is also a car owner, get bookings for their cars
-    car_ids = [car.id for car in Car.query.filter_by(owner_id=current_user.id).all()]
-    received_bookings = Booking.query.filter(Booking.car_id.in_(car_ids)).all() if car_ids else []
+    # Bookings the user made, and bookings of the user's cars
+    my_page = _dashboard_page('renter', rentals_cursor)
+    received_page = _dashboard_page('owner', received_cursor)
     
     return render_template(
         'bookings/list.html',
-        my_bookings=my_bookings,
-        received_bookings=received_bookings
+        my_bookings=my_page.items,
+        received_bookings=received_page.items,
+        rentals_cursor=rentals_cursor,
+        received_cursor=received_cursor,
+        rentals_next_cursor=my_page.next_cursor,
+        received_next_cursor=received_page.next_cursor,
+        active_tab=request.args.get('tab') if request.args.get('tab') == 'my-cars-booked' else 'my-rentals'
     )
 
 @booking_bp.route('/bookings/create/<int:car_id>', methods=['GET', 'POST'])
@@ -144,20 +169,10 @@ def update_booking_status(booking_id):
     new_status = request.form.get('status')
     
     # Validate status change permissions
-    valid_status_changes = {
-        'owner': {
-            'pending': ['confirmed', 'cancelled'],
-            'confirmed': ['completed', 'cancelled'],
-        },
-        'renter': {
-            'pending': ['cancelled'],
-            'confirmed': ['cancelled'],
-        }
-    }
-    
     user_type = 'owner' if is_owner else 'renter'
+    allowed = VALID_STATUS_CHANGES[user_type]
     
-    if booking.status not in valid_status_changes[user_type] or new_status not in valid_status_changes[user_type][booking.status]:
+    if booking.status not in allowed or new_status not in allowed[booking.status]:
         flash('Invalid status change.')
         return redirect(url_for('booking.view_booking', booking_id=booking_id))
     
@@ -168,6 +183,62 @@ def update_booking_status(booking_id):
     flash(f'Booking status updated to {new_status}.')
     return redirect(url_for('booking.view_booking', booking_id=booking_id))
 
+@booking_bp.route('/bookings/bulk-update-status', methods=['POST'])
+@login_required
+def bulk_update_booking_status():
+    """
+    Confirm, complete or cancel several bookings of the owner's cars at once.
+    Every booking is checked against the owner's allowed status changes, and
+    either all of them are updated in one transaction or none are.
+    """
+    new_status = request.form.get('status')
+    try:
+        booking_ids = sorted({int(booking_id) for booking_id in request.form.getlist('booking_ids')})
+    except ValueError:
+        booking_ids = []
+    
+    if not booking_ids:
+        flash('Select at least one booking.')
+        return redirect(url_for('booking.list_bookings'))
+    
+    limit = current_app.config['BOOKING_BULK_LIMIT']
+    if len(booking_ids) > limit:
+        flash(f'You can update at most {limit} bookings at once.')
+        return redirect(url_for('booking.list_bookings'))
+    
+    # Load the bookings with everything the notifications need in one query
+    bookings = Booking.query.options(
+        joinedload(Booking.car).joinedload(Car.owner),
+        joinedload(Booking.renter)
+    ).filter(Booking.id.in_(booking_ids)).all()
+    
+    # Missing bookings, other owners' bookings and disallowed changes all reject the request
+    allowed = VALID_STATUS_CHANGES['owner']
+    found = {booking.id for booking in bookings}
+    invalid = [booking_id for booking_id in booking_ids if booking_id not in found]
+    for booking in bookings:
+        if (booking.car.owner_id != current_user.id
+                or booking.status not in allowed
+                or new_status not in allowed[booking.status]):
+            invalid.append(booking.id)
+    
+    if invalid:
+        flash(f"Invalid status change for booking(s) {', '.join(str(booking_id) for booking_id in sorted(invalid))}. No bookings were updated.")
+        return redirect(url_for('booking.list_bookings'))
+    
+    # Use BookingManager with Observer pattern to update and notify in bulk
+    booking_manager = BookingManager()
+    booking_manager.attach(EmailNotifier())
+    booking_manager.attach(AppNotifier())
+    try:
+        booking_manager.update_booking_statuses(bookings, new_status)
+    except ValueError as e:
+        flash(f'{e} No bookings were updated.')
+        return redirect(url_for('booking.list_bookings'))
+    
+    flash(f'{len(bookings)} booking(s) updated to {new_status}.')
+    return redirect(url_for('booking.list_bookings'))
+
 @booking_bp.route('/bookings/<int:booking_id>/message', methods=['POST'])
 @login_required
 def send_message(booking_id):
@@ -233,4 +304,100 @@ def check_availability():
         return jsonify({'available': available})
         
     except Exception as e:
-        return jsonify({'available': False, 'error': str(e)})
\ No newline at end of file
+        return jsonify({'available': False, 'error': str(e)})
+
+@booking_bp.route('/api/check-availability/batch', methods=['POST'])
+def check_availability_batch():
+    """
+    API endpoint to check availability for many cars and date ranges at once.
+    Expects JSON {"checks": [{"car_id": 1, "start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"}, ...]}
+    and returns one result per check, in the same order.
+    """
+    data = request.get_json(silent=True) or {}
+    checks = data.get('checks')
+    
+    if not isinstance(checks, list):
+        return jsonify({'error': 'Missing parameters'}), 400
+    
+    limit = current_app.config['AVAILABILITY_BATCH_LIMIT']
+    if len(checks) > limit:
+        return jsonify({'error': f'At most {limit} checks per request'}), 400
+    
+    # Parse every check first so the valid ones can be resolved together
+    results = []
+    parsed = []
+    for check in checks:
+        result = {'available': False}
+        results.append(result)
+        
+        if not isinstance(check, dict):
+            result['error'] = 'Missing parameters'
+            continue
+        
+        result.update({
+            'car_id': check.get('car_id'),
+            'start_date': check.get('start_date'),
+            'end_date': check.get('end_date')
+        })
+        
+        if not result['car_id'] or not result['start_date'] or not result['end_date']:
+            result['error'] = 'Missing parameters'
+            continue
+        
+        try:
+            car_id = int(result['car_id'])
+            start_date = datetime.strptime(result['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(result['end_date'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            result['error'] = 'Invalid parameters'
+            continue
+        
+        parsed.append((result, (car_id, start_date, end_date)))
+    
+    availability = Car.check_availability_many([check for _, check in parsed])
+    for (result, _), available in zip(parsed, availability):
+        if available is None:
+            result['error'] = 'Car not found'
+        else:
+            result['available'] = available
+    
+    return jsonify({'results': results})
+
+@booking_bp.route('/api/calendar', methods=['GET'])
+def availability_calendar():
+    """
+    API endpoint returning day-by-day availability for one or more cars.
+    Accepts car_ids (comma-separated) and optional start_date and end_date;
+    the range defaults to 60 days from today.
+    
+    Each car's calendar is a hex string of a bitmap: bit i (counting from
+    the least significant bit) is set if the car can be booked on
+    start_date + i days.
+    """
+    try:
+        car_ids = [int(car_id) for car_id in request.args.get('car_ids', '').split(',') if car_id.strip()]
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else date.today()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else start_date + timedelta(days=59)
+    except ValueError:
+        return jsonify({'error': 'Invalid parameters'}), 400
+    
+    if not car_ids:
+        return jsonify({'error': 'Missing parameters'}), 400
+    
+    if len(car_ids) > current_app.config['AVAILABILITY_BATCH_LIMIT']:
+        return jsonify({'error': f"At most {current_app.config['AVAILABILITY_BATCH_LIMIT']} cars per request"}), 400
+    
+    days = (end_date - start_date).days + 1
+    if days < 1 or days > current_app.config['CALENDAR_MAX_DAYS']:
+        return jsonify({'error': f"Date range must be between 1 and {current_app.config['CALENDAR_MAX_DAYS']} days"}), 400
+    
+    calendars = Car.availability_calendars(car_ids, start_date, end_date)
+    
+    return jsonify({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'days': days,
+        'calendars': {str(car_id): format(bits, 'x').zfill((days + 3) // 4) for car_id, bits in calendars.items()}
+    })
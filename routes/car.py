@@ -1,14 +1,20 @@
 # routes/car.py
 # Routes for car listing management (create, view, update, delete)
 
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
+import math
 
 from app import db
 from models import Car
+from models.car import SORT_MODES
 from patterns.builder import CarListingBuilder, CarListingDirector
 from patterns.mediator import UIMediator, SearchComponent
+from services import car_search_index, location_index, search_cache
+from services.facets import RANGE_CRITERIA
+from services.search import DEFAULT_SEARCH_RADIUS_KM
+from services.suggest import SUGGESTION_LIMIT, MAX_SUGGESTION_LIMIT
 
 # Create Blueprint
 car_bp = Blueprint('car', __name__)
@@ -16,50 +22,159 @@ car_bp = Blueprint('car', __name__)
 # Create UI mediator for component communication
 ui_mediator = UIMediator()
 
-@car_bp.route('/cars')
-def list_cars():
+def _search_cars(args):
     """
-    Display all available cars or search results.
+    Run a car search from request arguments.
+    Shared by the listing page and the JSON endpoint that loads more results.
+    
+    Args:
+        args: The request arguments
+        
+    Returns:
+        Tuple of (SearchResults, form values, error messages)
     """
     # Get search parameters
-    location = request.args.get('location', '')
-    start_date_str = request.args.get('start_date', '')
-    end_date_str = request.args.get('end_date', '')
-    
-    # Initialize search component with mediator
-    search_component = SearchComponent(ui_mediator)
-    ui_mediator.register_component('search_component', search_component)
+    form = {
+        'location': args.get('location', ''),
+        'keywords': args.get('keywords', ''),
+        'near': args.get('near', ''),
+        'radius_km': args.get('radius_km', ''),
+        'start_date': args.get('start_date', ''),
+        'end_date': args.get('end_date', ''),
+        'trip_days': args.get('trip_days', ''),
+        'sort': args.get('sort', '')
+    }
+    for name in RANGE_CRITERIA:
+        form[name] = args.get(name, '')
+    errors = []
     
     # Prepare search criteria
-    criteria = {'location': location}
+    criteria = {
+        'location': form['location'],
+        'keywords': form['keywords'],
+        'near': form['near'],
+        'sort': form['sort'] if form['sort'] in SORT_MODES else None,
+        'cursor': args.get('cursor') or None,
+        'per_page': current_app.config['CARS_PER_PAGE']
+    }
+    
+    if form['radius_km']:
+        try:
+            criteria['radius_km'] = float(form['radius_km'])
+        except ValueError:
+            criteria['radius_km'] = DEFAULT_SEARCH_RADIUS_KM
+        else:
+            if not math.isfinite(criteria['radius_km']) or criteria['radius_km'] <= 0:
+                errors.append('Search radius must be more than 0 km.')
+                del criteria['radius_km']
+    
+    # Convert price, year and mileage bounds if provided
+    for name in RANGE_CRITERIA:
+        if form[name]:
+            try:
+                criteria[name] = float(form[name])
+            except ValueError:
+                errors.append('Invalid price, year or mileage filter.')
     
     # Convert dates if provided
-    if start_date_str and end_date_str:
+    if form['start_date'] and form['end_date']:
         try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            criteria['start_date'] = start_date
-            criteria['end_date'] = end_date
+            criteria['start_date'] = datetime.strptime(form['start_date'], '%Y-%m-%d').date()
+            criteria['end_date'] = datetime.strptime(form['end_date'], '%Y-%m-%d').date()
         except ValueError:
-            flash('Invalid date format.')
+            errors.append('Invalid date format.')
+    
+    # Flexible dates: the dates become a span to fit the trip into
+    if form['trip_days'] and 'start_date' in criteria:
+        span_days = (criteria['end_date'] - criteria['start_date']).days + 1
+        try:
+            trip_days = int(form['trip_days'])
+        except ValueError:
+            trip_days = 0
+        
+        if trip_days < 1 or trip_days > span_days:
+            errors.append('Trip length must be between 1 day and the number of days between the dates.')
+        elif span_days > current_app.config['CALENDAR_MAX_DAYS']:
+            errors.append(f"Flexible searches can span at most {current_app.config['CALENDAR_MAX_DAYS']} days.")
+        else:
+            criteria['trip_days'] = trip_days
+    
+    # Initialize search component with mediator
+    search_component = SearchComponent(ui_mediator)
+    ui_mediator.register_component('search_component', search_component)
     
-    # Search for cars using the search component
+    # Search for cars; the mediator hands the results back to the component
     search_component.search(criteria)
+    results = search_component.results
     
-    # Get the results from the database (in a real app, this would be handled by the mediator)
-    if 'start_date' in criteria and 'end_date' in criteria:
-        cars = Car.search_available_cars(location, criteria['start_date'], criteria['end_date'])
-    else:
-        cars = Car.search_available_cars(location)
+    return results, form, errors + results.errors
+
+@car_bp.route('/cars')
+def list_cars():
+    """
+    Display all available cars or search results, one page at a time.
+    """
+    results, form, errors = _search_cars(request.args)
+    
+    for error in errors:
+        flash(error)
     
     return render_template(
         'cars/list.html',
-        cars=cars,
-        location=location,
-        start_date=start_date_str,
-        end_date=end_date_str
+        cars=results.cars,
+        next_cursor=results.next_cursor,
+        distances=results.distances,
+        facets=results.facets,
+        start_dates=results.start_dates,
+        quotes=results.quotes,
+        truncated=results.truncated,
+        sort_modes=SORT_MODES,
+        **form
     )
 
+@car_bp.route('/api/cars')
+def api_list_cars():
+    """
+    API endpoint returning one page of search results as JSON.
+    Accepts the same parameters as the listing page plus a cursor.
+    """
+    results, form, errors = _search_cars(request.args)
+    
+    if errors:
+        return jsonify({'error': errors[0]}), 400
+    
+    cars = []
+    for car in results.cars:
+        car_data = car.to_dict()
+        car_data['url'] = url_for('car.view_car', car_id=car.id)
+        if car.id in results.distances:
+            car_data['distance_km'] = round(results.distances[car.id], 1)
+        if car.id in results.quotes:
+            car_data['total_price'] = results.quotes[car.id]
+        if car.id in results.start_dates:
+            car_data['start_dates'] = [day.isoformat() for day in results.start_dates[car.id]]
+        cars.append(car_data)
+    
+    response = {'cars': cars, 'next_cursor': results.next_cursor}
+    if results.facets:
+        response['facets'] = results.facets
+    if results.truncated:
+        response['truncated'] = True
+    
+    return jsonify(response)
+
+@car_bp.route('/api/locations/suggest')
+def suggest_locations():
+    """
+    API endpoint suggesting listing locations for the text typed so far.
+    Served from the in-memory location index, without a database query.
+    """
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', SUGGESTION_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_SUGGESTION_LIMIT))
+    
+    return jsonify({'suggestions': location_index.suggest(prefix, limit)})
+
 @car_bp.route('/my-cars')
 @login_required
 def my_cars():
@@ -134,9 +249,13 @@ def create_car():
             end_date=availability_end
         )
         
-        # Save to database
+        # Save to database and add it to the search index
         db.session.add(car)
+        db.session.flush()
+        car_search_index.index_car(car)
         db.session.commit()
+        search_cache.invalidate_car(car.to_dict())
+        location_index.add(car.location)
         
         flash('Car listing created successfully!')
         return redirect(url_for('car.my_cars'))
@@ -192,6 +311,9 @@ def edit_car(car_id):
             flash('Invalid input format.')
             return redirect(url_for('car.edit_car', car_id=car_id))
         
+        # Keep the old details to invalidate searches that matched them
+        old_details = car.to_dict()
+        
         # Update car details
         car.update_details(
             model=model,
@@ -203,6 +325,14 @@ def edit_car(car_id):
             availability_end=availability_end
         )
         
+        # Refresh the search index entry and save both in one transaction
+        car_search_index.index_car(car)
+        db.session.commit()
+        search_cache.invalidate_car(old_details, car.to_dict())
+        if car.location != old_details['location']:
+            location_index.remove(old_details['location'])
+            location_index.add(car.location)
+        
         flash('Car listing updated successfully!')
         return redirect(url_for('car.view_car', car_id=car_id))
     
@@ -231,9 +361,13 @@ def delete_car(car_id):
         flash('Cannot delete a car with active bookings.')
         return redirect(url_for('car.view_car', car_id=car_id))
     
-    # Delete the car
+    # Delete the car and its search index entry
+    old_details = car.to_dict()
+    car_search_index.remove_car(car.id)
     db.session.delete(car)
     db.session.commit()
+    search_cache.invalidate_car(old_details)
+    location_index.remove(old_details['location'])
     
     flash('Car listing deleted successfully!')
     return redirect(url_for('car.my_cars'))
@@ -289,9 +423,13 @@ def quick_create_car():
             flash('Invalid car type.')
             return redirect(url_for('car.quick_create_car'))
         
-        # Save to database
+        # Save to database and add it to the search index
         db.session.add(car)
+        db.session.flush()
+        car_search_index.index_car(car)
         db.session.commit()
+        search_cache.invalidate_car(car.to_dict())
+        location_index.add(car.location)
         
         flash('Car listing created successfully!')
         return redirect(url_for('car.my_cars'))
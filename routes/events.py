@@ -0,0 +1,29 @@
+# routes/events.py
+# Routes for the live event stream of messages and booking updates
+
+from flask import Blueprint, Response
+from flask_login import login_required, current_user
+
+from services import event_hub
+
+# Create Blueprint
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/stream')
+@login_required
+def stream():
+    """
+    Stream the current user's new messages and booking updates as Server-Sent Events.
+    """
+    # The user is loaded once here; the stream itself never queries the database
+    subscription = event_hub.subscribe(current_user.id)
+    
+    return Response(
+        event_hub.stream(subscription),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Tell reverse proxies not to buffer the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
@@ -1,11 +1,11 @@
 # routes/message.py
 # Routes for messaging functionality
 
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
 
 from app import db
-from models import Message, User, Booking, Car
+from models import Message, Conversation, User, Booking, Car
 from patterns.mediator import UIMediator, MessageComponent
 from patterns.observer import NotificationSubject, EmailNotifier, AppNotifier
 
@@ -15,53 +15,45 @@ message_bp = Blueprint('message', __name__)
 # Create UI mediator for component communication
 ui_mediator = UIMediator()
 
+def _conversation_booking(booking_id, user_id):
+    """
+    Get the booking a conversation is about, if it involves both users.
+    
+    Args:
+        booking_id: The ID of the booking from the request (optional)
+        user_id: The ID of the other user in the conversation
+        
+    Returns:
+        The Booking, or None if there is no valid booking context
+    """
+    if not booking_id:
+        return None
+    
+    booking = Booking.query.get(booking_id)
+    # Verify the booking involves both users
+    if booking and (booking.renter_id != current_user.id and booking.renter_id != user_id) and \
+       (booking.car.owner_id != current_user.id and booking.car.owner_id != user_id):
+        return None
+    return booking
+
 @message_bp.route('/messages')
 @login_required
 def inbox():
     """
     Display user's message inbox.
     """
-    # Get all unique conversations (grouped by the other user)
-    sent_messages = Message.query.filter_by(sender_id=current_user.id).all()
-    received_messages = Message.query.filter_by(receiver_id=current_user.id).all()
-    
-    # Combine messages and get unique conversations
-    conversations = {}
-    
-    # Process sent messages
-    for msg in sent_messages:
-        other_user_id = msg.receiver_id
-        if other_user_id not in conversations:
-            other_user = User.query.get(other_user_id)
-            conversations[other_user_id] = {
-                'user': other_user,
-                'last_message': msg,
-                'unread_count': 0
-            }
-        elif msg.created_at > conversations[other_user_id]['last_message'].created_at:
-            conversations[other_user_id]['last_message'] = msg
-    
-    # Process received messages
-    for msg in received_messages:
-        other_user_id = msg.sender_id
-        if other_user_id not in conversations:
-            other_user = User.query.get(other_user_id)
-            conversations[other_user_id] = {
-                'user': other_user,
-                'last_message': msg,
-                'unread_count': 1 if not msg.is_read else 0
-            }
-        else:
-            if msg.created_at > conversations[other_user_id]['last_message'].created_at:
-                conversations[other_user_id]['last_message'] = msg
-            if not msg.is_read:
-                conversations[other_user_id]['unread_count'] += 1
-    
-    # Convert to list and sort by most recent message
-    conversation_list = list(conversations.values())
-    conversation_list.sort(key=lambda x: x['last_message'].created_at, reverse=True)
-    
-    return render_template('messages/inbox.html', conversations=conversation_list)
+    cursor = request.args.get('cursor') or None
+    per_page = current_app.config['CONVERSATIONS_PER_PAGE']
+    
+    # One indexed read of the conversations table, with partner and latest message joined
+    try:
+        page = Conversation.inbox_page(current_user.id, cursor=cursor, per_page=per_page)
+    except ValueError:
+        flash('Invalid page token.')
+        cursor = None
+        page = Conversation.inbox_page(current_user.id, per_page=per_page)
+    
+    return render_template('messages/inbox.html', conversations=page.items, cursor=cursor, next_cursor=page.next_cursor)
 
 @message_bp.route('/messages/conversation/<int:user_id>', methods=['GET', 'POST'])
 @login_required
@@ -77,13 +69,7 @@ def conversation(user_id):
     
     # Check if there's a booking context
     booking_id = request.args.get('booking_id')
-    booking = None
-    if booking_id:
-        booking = Booking.query.get(booking_id)
-        # Verify the booking involves both users
-        if booking and (booking.renter_id != current_user.id and booking.renter_id != user_id) and \
-           (booking.car.owner_id != current_user.id and booking.car.owner_id != user_id):
-            booking = None
+    booking = _conversation_booking(booking_id, user_id)
     
     # Handle sending a new message
     if request.method == 'POST':
@@ -117,19 +103,46 @@ def conversation(user_id):
         flash('Message sent.')
         return redirect(url_for('message.conversation', user_id=user_id, booking_id=booking_id))
     
-    # Get conversation history
-    messages = Message.get_conversation(current_user.id, user_id, booking.id if booking else None)
-    
-    # Mark received messages as read
-    for msg in messages:
-        if msg.receiver_id == current_user.id and not msg.is_read:
-            msg.mark_as_read()
+    # Mark received messages as read with one UPDATE, then get the latest page of history
+    Message.mark_conversation_read(current_user.id, user_id, booking.id if booking else None)
+    page = Message.conversation_page(current_user.id, user_id, booking.id if booking else None,
+                                     per_page=current_app.config['MESSAGES_PER_PAGE'])
     
     return render_template('messages/conversation.html', 
                           other_user=other_user, 
-                          messages=messages, 
+                          messages=page.items, 
+                          next_cursor=page.next_cursor,
                           booking=booking)
 
+@message_bp.route('/messages/conversation/<int:user_id>/history')
+@login_required
+def conversation_history(user_id):
+    """
+    Get a page of older messages in a conversation as JSON.
+    
+    Args:
+        user_id: The ID of the other user in the conversation
+    """
+    User.query.get_or_404(user_id)
+    booking = _conversation_booking(request.args.get('booking_id'), user_id)
+    
+    try:
+        page = Message.conversation_page(current_user.id, user_id, booking.id if booking else None,
+                                         cursor=request.args.get('cursor') or None,
+                                         per_page=current_app.config['MESSAGES_PER_PAGE'])
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    messages = []
+    for message in page.items:
+        data = message.to_dict()
+        data['sender_name'] = message.sender.name
+        data['created_at_display'] = message.created_at.strftime('%b %d, %Y %I:%M %p')
+        data['sent'] = message.sender_id == current_user.id
+        messages.append(data)
+    
+    return jsonify({'success': True, 'messages': messages, 'next_cursor': page.next_cursor})
+
 @message_bp.route('/messages/new', methods=['GET', 'POST'])
 @login_required
 def new_message():
@@ -214,6 +227,57 @@ def mark_read(message_id):
     message.mark_as_read()
     return jsonify({'success': True})
 
+@message_bp.route('/messages/mark-read', methods=['POST'])
+@login_required
+def mark_read_batch():
+    """
+    Mark several received messages as read at once.
+    
+    Takes either a list of message IDs (message_ids) or a watermark (up_to)
+    marking every message up to and including that ID as read, optionally
+    within one conversation (conversation_id). Accepts JSON or form data.
+    """
+    invalid = (jsonify({'success': False, 'error': 'Invalid message IDs'}), 400)
+    
+    if request.is_json:
+        # JSON IDs must be real integers; strings and booleans are rejected, not coerced
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return invalid
+        message_ids = data.get('message_ids') or []
+        up_to = data.get('up_to')
+        conversation_id = data.get('conversation_id')
+        if not isinstance(message_ids, list) or not all(type(value) is int for value in message_ids):
+            return invalid
+        if any(value is not None and type(value) is not int for value in (up_to, conversation_id)):
+            return invalid
+    else:
+        data = request.form
+        try:
+            message_ids = [int(message_id) for message_id in data.getlist('message_ids')]
+            up_to = int(data['up_to']) if data.get('up_to') else None
+            conversation_id = int(data['conversation_id']) if data.get('conversation_id') else None
+        except ValueError:
+            return invalid
+    
+    if bool(message_ids) == (up_to is not None):
+        return jsonify({'success': False, 'error': 'Provide either message_ids or up_to'}), 400
+    
+    limit = current_app.config['MESSAGE_MARK_READ_LIMIT']
+    if len(message_ids) > limit:
+        return jsonify({'success': False, 'error': f'At most {limit} messages can be marked at once'}), 400
+    
+    # Only the current user's received messages are ever matched
+    if message_ids:
+        criteria = [Message.id.in_(set(message_ids))]
+    else:
+        criteria = [Message.id <= up_to]
+    if conversation_id is not None:
+        criteria.append(Message.conversation_id == conversation_id)
+    
+    count = Message.mark_read_where(current_user.id, *criteria)
+    return jsonify({'success': True, 'marked': count})
+
 @message_bp.route('/messages/unread-count')
 @login_required
 def unread_count():
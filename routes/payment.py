@@ -9,6 +9,7 @@ from database import db
 from models import Booking, Payment, PaymentMethod
 from patterns.proxy import PaymentProxy
 from patterns.observer import NotificationSubject, EmailNotifier, AppNotifier
+from services.pricing import quote
 
 # Create Blueprint
 payment_bp = Blueprint('payment', __name__)
@@ -45,8 +46,7 @@ def make_payment(booking_id):
         return redirect(url_for('booking.view_booking', booking_id=booking_id))
     
     # Calculate the total amount
-    total_days = (booking.end_date - booking.start_date).days + 1
-    amount = booking.car.daily_price * total_days
+    amount = quote(booking.car.daily_price, booking.start_date, booking.end_date)
     
     if request.method == 'POST':
         payment_type = request.form.get('payment_type', 'new')
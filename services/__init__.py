@@ -0,0 +1,32 @@
+# services/__init__.py
+# Initialize the services package and make shared service instances available at the package level
+
+# Availability index for booking overlap checks
+from .availability import CarIntervals, AvailabilityIndex, availability_index
+
+# Full-text search over car locations and models
+from .text_search import CarSearchIndex, car_search_index
+
+# Location autocomplete
+from .suggest import LocationIndex, location_index
+
+# Cache of search results, invalidated by car and booking writes
+from .cache import CachedSearch, SearchCache, search_cache
+
+# Relevance ranking of search candidates
+from .ranking import CarRanker, car_ranker
+
+# Atomic booking reservations
+from .reservations import ReservationEngine, reservation_engine
+
+# Expiry of pending bookings that are not confirmed in time
+from .expiry import BookingExpiryScheduler, booking_expiry
+
+# Recurring background jobs
+from .jobs import JobWheel, job_wheel
+
+# Live events for the Server-Sent Events stream
+from .events import Subscription, EventHub, event_hub
+
+# Car search shared by the listing routes and the SearchComponent
+from .search import SearchResults, CarSearchService, car_search_service
@@ -0,0 +1,442 @@
+# services/availability.py
+# In-memory per-car interval index used to answer booking overlap checks
+
+import bisect
+import threading
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session, object_session
+
+# Most car IDs read by one version or interval query
+QUERY_BATCH_SIZE = 500
+
+class CarIntervals:
+    """
+    Sorted booking intervals for a single car.
+    Answers "does anything overlap this range?" with one binary search.
+    """
+    def __init__(self, intervals):
+        """
+        Build the interval structure.
+
+        Args:
+            intervals: Iterable of (start_date, end_date) tuples
+        """
+        intervals = sorted(intervals)
+        self._intervals = intervals
+        self._starts = [start for start, _ in intervals]
+
+        # Running maximum of end dates, so bookings that overlap each other
+        # (e.g. left over from before the overlap check existed) still work
+        self._max_ends = []
+        max_end = None
+        for _, end in intervals:
+            max_end = end if max_end is None or end > max_end else max_end
+            self._max_ends.append(max_end)
+
+    def __len__(self):
+        """
+        Number of intervals stored for the car.
+
+        Returns:
+            The interval count
+        """
+        return len(self._starts)
+
+    def overlaps(self, start_date, end_date):
+        """
+        Check whether any stored interval overlaps an inclusive date range.
+
+        Args:
+            start_date: The start date of the range
+            end_date: The end date of the range
+
+        Returns:
+            True if an interval overlaps the range, False otherwise
+        """
+        # Intervals starting after end_date can never overlap; of the rest,
+        # the one reaching furthest decides the answer
+        position = bisect.bisect_right(self._starts, end_date)
+        return position > 0 and self._max_ends[position - 1] >= start_date
+
+    def booked_days(self, start_date, end_date):
+        """
+        Get the days of an inclusive date range covered by stored intervals.
+
+        Args:
+            start_date: The first day of the range
+            end_date: The last day of the range
+
+        Returns:
+            Integer bitmap where bit i is set if start_date + i days is booked
+        """
+        days = (end_date - start_date).days + 1
+        booked = 0
+        for start, end in self._intervals[:bisect.bisect_right(self._starts, end_date)]:
+            if end < start_date:
+                continue
+            first = max((start - start_date).days, 0)
+            last = min((end - start_date).days, days - 1)
+            booked |= ((1 << (last - first + 1)) - 1) << first
+        return booked
+
+class AvailabilityIndex:
+    """
+    Per-car cache of active booking intervals and availability calendars.
+
+    Each car's intervals are loaded from the database on first use and
+    dropped again, with its calendar, whenever a booking for that car is
+    committed, so the next check reloads them. Checks fall back to the SQL overlap query when the
+    index has not been attached to an application.
+
+    Bookings written by other processes never reach this process's session
+    events, so every cached entry also records the car's booking_version it
+    was built from. Each check reads the current versions of the cars it
+    needs in one primary-key query and reloads any car whose version moved.
+    The version is bumped by every reservation and every booking change.
+    """
+    def __init__(self):
+        """
+        Initialize an empty index.
+        """
+        self._cars = {}
+        self._calendars = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._enabled = False
+
+    def init_app(self, app):
+        """
+        Attach the index to the application and listen for booking writes.
+
+        Args:
+            app: The Flask application
+        """
+        # This import is placed here to avoid circular imports
+        from models.booking import Booking
+
+        if not event.contains(Booking, 'after_insert', _record_booking_write):
+            event.listen(Booking, 'after_insert', _record_booking_write)
+            event.listen(Booking, 'after_update', _record_booking_write)
+            event.listen(Booking, 'after_delete', _record_booking_write)
+            event.listen(Booking, 'after_update', _bump_changed_booking)
+            event.listen(Booking, 'after_delete', _bump_changed_booking)
+            event.listen(Session, 'after_commit', _flush_booking_writes)
+            event.listen(Session, 'after_rollback', _flush_booking_writes)
+
+        self._enabled = app.config.get('AVAILABILITY_INDEX_ENABLED', True)
+        self.clear()
+
+    def has_overlap(self, car_id, start_date, end_date):
+        """
+        Check whether a car has an active booking overlapping a date range.
+
+        Args:
+            car_id: The ID of the car
+            start_date: The start date of the range
+            end_date: The end date of the range
+
+        Returns:
+            True if an active booking overlaps the range, False otherwise
+        """
+        if not self._enabled:
+            # This import is placed here to avoid circular imports
+            from models.booking import Booking
+            return Booking.has_overlap(car_id, start_date, end_date)
+
+        return self.get_intervals(car_id).overlaps(start_date, end_date)
+
+    def overlaps_many(self, checks):
+        """
+        Check several cars and date ranges at once.
+        Cars not yet in the index are loaded together with one query.
+
+        Args:
+            checks: List of (car_id, start_date, end_date) tuples
+
+        Returns:
+            List of booleans, True where an active booking overlaps the range
+        """
+        versions = self.current_versions({car_id for car_id, _, _ in checks})
+        intervals = self._cached_intervals(versions)
+        missing = [car_id for car_id, cached in intervals.items() if cached is None]
+        intervals.update(self.load_many(missing, versions))
+
+        return [intervals[car_id].overlaps(start_date, end_date) for car_id, start_date, end_date in checks]
+
+    def calendars(self, windows, start_date, end_date):
+        """
+        Get per-day availability bitmaps for several cars.
+
+        A bitmap of each car's whole availability period is cached and cut
+        down to the requested range, so repeated calendar requests for a car
+        do not touch the database until one of its bookings changes.
+
+        Args:
+            windows: Dictionary mapping car ID to (availability_start, availability_end)
+            start_date: The first day of the range
+            end_date: The last day of the range
+
+        Returns:
+            Dictionary mapping car ID to an integer bitmap where bit i is set
+            if the car is available on start_date + i days
+        """
+        days = (end_date - start_date).days + 1
+        range_mask = (1 << days) - 1
+
+        versions = self.current_versions(windows)
+        with self._lock:
+            generations = {car_id: self._generations.get(car_id, 0) for car_id in windows}
+            cached = {car_id: self._calendars.get(car_id) for car_id in windows}
+
+        # A cached bitmap is only valid for the availability period and booking version it was built for
+        stale = [car_id for car_id, window in windows.items()
+                 if cached[car_id] is None or cached[car_id][0] != window or cached[car_id][2] != versions[car_id]]
+        intervals = self._cached_intervals({car_id: versions[car_id] for car_id in stale})
+        intervals.update(self.load_many([car_id for car_id, loaded in intervals.items() if loaded is None], versions))
+
+        for car_id in stale:
+            window_start, window_end = windows[car_id]
+            if window_start > window_end:
+                bits = 0
+            else:
+                window_mask = (1 << ((window_end - window_start).days + 1)) - 1
+                bits = window_mask & ~intervals[car_id].booked_days(window_start, window_end)
+            cached[car_id] = (windows[car_id], bits, versions[car_id])
+
+        if self._enabled and stale:
+            with self._lock:
+                for car_id in stale:
+                    if self._generations.get(car_id, 0) == generations[car_id]:
+                        self._calendars[car_id] = cached[car_id]
+
+        calendars = {}
+        for car_id, ((window_start, _), bits, _) in cached.items():
+            offset = (start_date - window_start).days
+            shifted = bits >> offset if offset >= 0 else bits << -offset
+            calendars[car_id] = shifted & range_mask
+        return calendars
+
+    def get_intervals(self, car_id):
+        """
+        Get the active booking intervals for a car, loading them if needed.
+
+        Args:
+            car_id: The ID of the car
+
+        Returns:
+            CarIntervals for the car
+        """
+        versions = self.current_versions([car_id])
+        intervals = self._cached_intervals(versions)[car_id]
+        if intervals is None:
+            intervals = self.load_many([car_id], versions)[car_id]
+        return intervals
+
+    def current_versions(self, car_ids):
+        """
+        Read the current booking_version of several cars.
+
+        Args:
+            car_ids: Iterable of car IDs
+
+        Returns:
+            Dictionary mapping each car ID to its booking version
+        """
+        # This import is placed here to avoid circular imports
+        from models.car import Car
+        from app import db
+
+        car_ids = list(car_ids)
+        versions = {car_id: 0 for car_id in car_ids}
+        for start in range(0, len(car_ids), QUERY_BATCH_SIZE):
+            versions.update(
+                (car_id, version or 0) for car_id, version in db.session.query(Car.id, Car.booking_version).filter(
+                    Car.id.in_(car_ids[start:start + QUERY_BATCH_SIZE])
+                )
+            )
+        return versions
+
+    def _cached_intervals(self, versions):
+        """
+        Get the cached intervals that are still current.
+
+        Args:
+            versions: Dictionary mapping car ID to its current booking version
+
+        Returns:
+            Dictionary mapping each car ID to its CarIntervals, or None if
+            missing or built from an older version
+        """
+        with self._lock:
+            cached = {car_id: self._cars.get(car_id) for car_id in versions}
+        return {
+            car_id: entry[1] if entry is not None and entry[0] == versions[car_id] else None
+            for car_id, entry in cached.items()
+        }
+
+    def load_many(self, car_ids, versions=None):
+        """
+        Load the active booking intervals for several cars.
+
+        Args:
+            car_ids: Iterable of car IDs
+            versions: Current booking versions of the cars, if already read (optional)
+
+        Returns:
+            Dictionary mapping each car ID to its CarIntervals
+        """
+        # This import is placed here to avoid circular imports
+        from models.booking import Booking, ACTIVE_STATUSES
+        from app import db
+
+        car_ids = set(car_ids)
+        if not car_ids:
+            return {}
+
+        # Remember the generation before reading so a booking committed while
+        # the query runs is not overwritten by the stale result
+        with self._lock:
+            generations = {car_id: self._generations.get(car_id, 0) for car_id in car_ids}
+
+        # The versions are read before the intervals, so a booking committed in
+        # between leaves the entry marked with the older version and it is reloaded
+        if versions is None:
+            versions = self.current_versions(car_ids)
+
+        grouped = {car_id: [] for car_id in car_ids}
+        car_ids = list(car_ids)
+        for start in range(0, len(car_ids), QUERY_BATCH_SIZE):
+            rows = db.session.query(Booking.car_id, Booking.start_date, Booking.end_date).filter(
+                Booking.car_id.in_(car_ids[start:start + QUERY_BATCH_SIZE]),
+                Booking.status.in_(ACTIVE_STATUSES)
+            )
+            for car_id, start_date, end_date in rows:
+                grouped[car_id].append((start_date, end_date))
+
+        loaded = {car_id: CarIntervals(intervals) for car_id, intervals in grouped.items()}
+
+        if self._enabled:
+            with self._lock:
+                for car_id, intervals in loaded.items():
+                    if self._generations.get(car_id, 0) == generations[car_id]:
+                        self._cars[car_id] = (versions[car_id], intervals)
+
+        return loaded
+
+    def invalidate(self, car_ids):
+        """
+        Drop cached intervals so they are reloaded on the next check.
+        Call this after writes that bypass the ORM, such as bulk updates.
+
+        Args:
+            car_ids: Iterable of car IDs
+        """
+        with self._lock:
+            for car_id in car_ids:
+                self._cars.pop(car_id, None)
+                self._calendars.pop(car_id, None)
+                self._generations[car_id] = self._generations.get(car_id, 0) + 1
+
+    def clear(self):
+        """
+        Drop all cached intervals.
+        """
+        with self._lock:
+            for car_id in set(self._cars) | set(self._calendars):
+                self._generations[car_id] = self._generations.get(car_id, 0) + 1
+            self._cars.clear()
+            self._calendars.clear()
+
+def bump_booking_versions(car_ids):
+    """
+    Bump the booking version of cars whose bookings were changed by a bulk
+    update, which skips the ORM events. Call before the update is committed;
+    the caller commits.
+
+    Args:
+        car_ids: Iterable of car IDs
+    """
+    # This import is placed here to avoid circular imports
+    from app import db
+
+    car_ids = sorted(set(car_ids))
+    for start in range(0, len(car_ids), QUERY_BATCH_SIZE):
+        db.session.execute(_version_bump(car_ids[start:start + QUERY_BATCH_SIZE]))
+
+def _version_bump(car_ids):
+    """
+    Build the UPDATE bumping the booking version of some cars.
+
+    Args:
+        car_ids: Iterable of car IDs
+
+    Returns:
+        Update statement
+    """
+    # This import is placed here to avoid circular imports
+    from models.car import Car
+
+    cars = Car.__table__
+    # updated_at is set to itself so the car's onupdate timestamp does not fire
+    return cars.update().where(cars.c.id.in_(list(car_ids))).values(
+        booking_version=func.coalesce(cars.c.booking_version, 0) + 1,
+        updated_at=cars.c.updated_at
+    )
+
+def _record_booking_write(mapper, connection, booking):
+    """
+    Remember which cars had bookings written during the current flush.
+
+    Args:
+        mapper: The Booking mapper
+        connection: The database connection
+        booking: The Booking being written
+    """
+    session = object_session(booking)
+    if session is None:
+        availability_index.invalidate([booking.car_id])
+        return
+
+    dirty = session.info.setdefault('availability_dirty_cars', set())
+    dirty.add(booking.car_id)
+
+    # A booking moved to another car affects the car it left as well
+    for car_id in inspect(booking).attrs.car_id.history.deleted:
+        if car_id is not None:
+            dirty.add(car_id)
+
+def _bump_changed_booking(mapper, connection, booking):
+    """
+    Bump the booking version of the cars of a booking whose status, dates or
+    car changed, in the same transaction, so other processes reload them.
+    New bookings are bumped by the reservation engine itself.
+
+    Args:
+        mapper: The Booking mapper
+        connection: The database connection
+        booking: The Booking being updated or deleted
+    """
+    state = inspect(booking)
+    if not state.deleted and not any(
+        getattr(state.attrs, name).history.has_changes()
+        for name in ('status', 'start_date', 'end_date', 'car_id')
+    ):
+        return
+
+    car_ids = {booking.car_id} | {car_id for car_id in state.attrs.car_id.history.deleted if car_id is not None}
+    connection.execute(_version_bump(car_ids))
+
+def _flush_booking_writes(session):
+    """
+    Invalidate cars whose bookings were written once the transaction ends.
+
+    Args:
+        session: The session that committed or rolled back
+    """
+    dirty = session.info.pop('availability_dirty_cars', None)
+    if dirty:
+        availability_index.invalidate(dirty)
+
+# Shared index instance
+availability_index = AvailabilityIndex()
@@ -0,0 +1,270 @@
+# services/cache.py
+# LRU/TTL cache for car search results with write-driven invalidation
+
+import threading
+import time
+from collections import OrderedDict
+
+from .facets import RANGE_CRITERIA
+from .geo import normalize_place
+from .ranking import RELEVANCE_SORT
+from .text_search import tokenize
+
+class CachedSearch:
+    """
+    A cached search: the criteria it answers and the IDs of the cars it found.
+    Car objects are not cached because they belong to the request's session.
+    """
+    def __init__(self, criteria, car_ids, next_cursor, distances, errors, facets, start_dates, truncated, expires_at):
+        """
+        Initialize the cache entry.
+
+        Args:
+            criteria: The normalized criteria dictionary
+            car_ids: IDs of the cars on the page, in result order
+            next_cursor: Cursor for the next page, or None
+            distances: Dictionary of distance in km by car ID
+            errors: List of search error messages
+            facets: Dictionary of facet counts
+            start_dates: Dictionary of possible start dates by car ID
+            truncated: Whether only the newest matches were ranked
+            expires_at: Monotonic time after which the entry is stale
+        """
+        self.criteria = criteria
+        self.car_ids = car_ids
+        self.next_cursor = next_cursor
+        self.distances = distances
+        self.errors = errors
+        self.facets = facets
+        self.start_dates = start_dates
+        self.truncated = truncated
+        self.expires_at = expires_at
+
+class SearchCache:
+    """
+    Bounded cache of search results keyed by normalized criteria.
+
+    Entries are evicted least-recently-used once the cache is full and
+    expire after a time-to-live, which also bounds staleness when several
+    processes serve the app. Writes invalidate only the entries they can
+    affect: a listing change drops searches whose text criteria could match
+    the car, a booking change drops searches whose dates overlap it.
+    """
+    def __init__(self, max_entries=256, ttl=60):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries: The maximum number of cached searches (default: 256)
+            ttl: Seconds before an entry expires (default: 60)
+        """
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def init_app(self, app):
+        """
+        Configure the cache from the application settings.
+
+        Args:
+            app: The Flask application
+        """
+        self.max_entries = app.config.get('SEARCH_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config.get('SEARCH_CACHE_TTL', self.ttl)
+        self.clear()
+
+    @staticmethod
+    def normalize(criteria):
+        """
+        Normalize search criteria so equivalent searches share an entry.
+
+        Args:
+            criteria: The search criteria dictionary
+
+        Returns:
+            Dictionary of normalized criteria
+        """
+        normalized = {}
+        for name in ('location', 'keywords'):
+            words = tokenize(criteria.get(name))
+            if words:
+                normalized[name] = ' '.join(words)
+
+        # Places are resolved from their punctuation as well as their words
+        # ("Dearborn, MI" is found, "Dearborn MI" is not), so they are keyed
+        # the way the gazetteer reads them rather than by search tokens
+        if criteria.get('near') and normalize_place(criteria['near']):
+            normalized['near'] = normalize_place(criteria['near'])
+        if criteria.get('sort') == RELEVANCE_SORT and criteria.get('location'):
+            # Relevance searches also score distance from the resolved location
+            normalized['location_place'] = normalize_place(criteria['location'])
+
+        if criteria.get('start_date') and criteria.get('end_date'):
+            normalized['start_date'] = criteria['start_date']
+            normalized['end_date'] = criteria['end_date']
+
+            if criteria.get('trip_days'):
+                normalized['trip_days'] = int(criteria['trip_days'])
+
+        if normalized.get('near') and criteria.get('radius_km'):
+            normalized['radius_km'] = float(criteria['radius_km'])
+
+        for name in RANGE_CRITERIA:
+            if criteria.get(name) is not None:
+                normalized[name] = float(criteria[name])
+
+        for name in ('sort', 'cursor', 'per_page'):
+            if criteria.get(name):
+                normalized[name] = criteria[name]
+        return normalized
+
+    @staticmethod
+    def make_key(normalized):
+        """
+        Build a hashable cache key from normalized criteria.
+
+        Args:
+            normalized: Dictionary from normalize()
+
+        Returns:
+            Tuple usable as a dictionary key
+        """
+        return tuple(sorted(normalized.items()))
+
+    def get(self, criteria):
+        """
+        Look up a cached search.
+
+        Args:
+            criteria: The search criteria dictionary
+
+        Returns:
+            CachedSearch, or None if missing or expired
+        """
+        key = self.make_key(self.normalize(criteria))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, criteria, results):
+        """
+        Cache the results of a search.
+
+        Args:
+            criteria: The search criteria dictionary
+            results: The SearchResults to cache
+        """
+        if self.max_entries <= 0:
+            return
+
+        normalized = self.normalize(criteria)
+        entry = CachedSearch(
+            normalized,
+            [car.id for car in results.cars],
+            results.next_cursor,
+            dict(results.distances),
+            list(results.errors),
+            results.facets,
+            dict(results.start_dates),
+            results.truncated,
+            time.monotonic() + self.ttl
+        )
+        key = self.make_key(normalized)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_car(self, *snapshots):
+        """
+        Drop searches that could include a car that was created, edited or deleted.
+
+        Args:
+            *snapshots: Dictionaries with the car's 'location' and 'model',
+                one per version of the car (e.g. before and after an edit)
+        """
+        car_words = [
+            (tokenize(snapshot.get('location')), tokenize(snapshot.get('location')) + tokenize(snapshot.get('model')))
+            for snapshot in snapshots
+        ]
+
+        def affected(criteria):
+            # Radius and nearest searches depend on every car around the point
+            if 'near' in criteria:
+                return True
+            for location_words, all_words in car_words:
+                if _words_match(criteria.get('location'), location_words) and \
+                   _words_match(criteria.get('keywords'), all_words):
+                    return True
+            return False
+
+        self._invalidate(affected)
+
+    def invalidate_booking(self, start_date, end_date):
+        """
+        Drop searches whose date range overlaps a booking that changed.
+        Searches without dates do not exclude booked cars, so they are kept.
+
+        Args:
+            start_date: The start date of the booking
+            end_date: The end date of the booking
+        """
+        def affected(criteria):
+            return 'start_date' in criteria and \
+                criteria['start_date'] <= end_date and criteria['end_date'] >= start_date
+
+        self._invalidate(affected)
+
+    def clear(self):
+        """
+        Drop every cached search.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        """
+        Number of cached searches.
+
+        Returns:
+            The entry count
+        """
+        return len(self._entries)
+
+    def _invalidate(self, affected):
+        """
+        Drop every entry whose criteria satisfy a predicate.
+
+        Args:
+            affected: Function taking normalized criteria and returning True to drop
+        """
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if affected(entry.criteria)]:
+                del self._entries[key]
+
+def _words_match(search_text, car_words):
+    """
+    Check whether every searched word is a prefix of one of the car's words,
+    mirroring how the full-text index matches.
+
+    Args:
+        search_text: Normalized search text, or None for no filter
+        car_words: List of the car's words
+
+    Returns:
+        True if the car could match the search text, False otherwise
+    """
+    if not search_text:
+        return True
+    return all(any(word.startswith(term) for word in car_words) for term in search_text.split())
+
+# Shared cache instance
+search_cache = SearchCache()
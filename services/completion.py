@@ -0,0 +1,142 @@
+# services/completion.py
+# Scheduled job marking confirmed bookings as completed once their end date has passed
+
+from datetime import date, datetime
+
+from flask import current_app
+
+# Default number of bookings completed per UPDATE statement
+DEFAULT_BATCH_SIZE = 500
+
+def complete_finished_bookings(today=None, batch_size=None):
+    """
+    Mark every confirmed booking that ended before today as completed.
+
+    Bookings are completed in set-based batches: one SELECT of up to
+    batch_size IDs, one UPDATE of those rows, one commit. The caches are
+    invalidated once for the whole run, and each renter and owner gets a
+    single notification listing all of their completed bookings.
+
+    Args:
+        today: The current date (default: today)
+        batch_size: The number of bookings per batch
+            (default: the BOOKING_COMPLETION_BATCH_SIZE setting)
+
+    Returns:
+        Number of bookings completed
+    """
+    # This import is placed here to avoid circular imports
+    from app import db
+    from models.booking import Booking
+    from .availability import availability_index, bump_booking_versions
+    from .cache import search_cache
+
+    today = today or date.today()
+    batch_size = batch_size or current_app.config.get('BOOKING_COMPLETION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    completed = []
+
+    while True:
+        batch = db.session.query(
+            Booking.id, Booking.car_id, Booking.renter_id, Booking.start_date, Booking.end_date
+        ).filter(
+            Booking.status == 'confirmed',
+            Booking.end_date < today
+        ).order_by(Booking.end_date, Booking.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        # The status check is repeated so rows changed since the SELECT are left alone
+        stamp = datetime.utcnow()
+        updated = db.session.query(Booking).filter(
+            Booking.id.in_([row.id for row in batch]),
+            Booking.status == 'confirmed'
+        ).update({Booking.status: 'completed', Booking.updated_at: stamp}, synchronize_session=False)
+
+        if updated == len(batch):
+            changed_rows = batch
+        else:
+            changed = {booking_id for (booking_id,) in db.session.query(Booking.id).filter(
+                Booking.id.in_([row.id for row in batch]),
+                Booking.status == 'completed',
+                Booking.updated_at == stamp
+            )}
+            changed_rows = [row for row in batch if row.id in changed]
+
+        # Other processes see the change through the cars' booking versions
+        bump_booking_versions(row.car_id for row in changed_rows)
+        db.session.commit()
+        completed.extend(changed_rows)
+
+        if len(batch) < batch_size:
+            break
+
+    if not completed:
+        return 0
+
+    # Bulk updates skip the ORM events that normally refresh these
+    availability_index.invalidate({row.car_id for row in completed})
+    search_cache.invalidate_booking(min(row.start_date for row in completed), max(row.end_date for row in completed))
+
+    _notify_completed(completed)
+    return len(completed)
+
+def _notify_completed(completed):
+    """
+    Send one notification per renter and per owner for their completed bookings.
+
+    Args:
+        completed: Rows with id, car_id and renter_id of the completed bookings
+    """
+    # This import is placed here to avoid circular imports
+    from models.car import Car
+    from models.user import User
+    from patterns.observer import NotificationSubject, EmailNotifier, AppNotifier
+    from .events import event_hub
+
+    cars = {car.id: car for car in Car.query.filter(Car.id.in_({row.car_id for row in completed}))}
+    recipients = {row.renter_id for row in completed} | {car.owner_id for car in cars.values()}
+    users = {user.id: user for user in User.query.filter(User.id.in_(recipients))}
+
+    trips = {}
+    rentals = {}
+    for row in completed:
+        car = cars[row.car_id]
+        trips.setdefault(row.renter_id, []).append(car.model)
+        rentals.setdefault(car.owner_id, []).append(car.model)
+
+        event = {'booking_id': row.id, 'status': 'completed', 'old_status': 'confirmed', 'car_name': car.model}
+        for user_id in {row.renter_id, car.owner_id}:
+            event_hub.publish(user_id, 'booking_status', event)
+
+    notification_subject = NotificationSubject()
+    notification_subject.attach(EmailNotifier())
+    notification_subject.attach(AppNotifier())
+
+    for user_id, models in trips.items():
+        notification_subject.notify({
+            'notification_type': 'bookings_completed',
+            'user_id': user_id,
+            'user_email': users[user_id].email,
+            'message': f"{_count(models, 'trip')} completed: {', '.join(models)}. Thank you for renting with DriveShare!"
+        })
+
+    for user_id, models in rentals.items():
+        notification_subject.notify({
+            'notification_type': 'bookings_completed',
+            'user_id': user_id,
+            'user_email': users[user_id].email,
+            'message': f"{_count(models, 'rental')} of your cars completed: {', '.join(models)}."
+        })
+
+def _count(items, noun):
+    """
+    Describe how many items there are, e.g. "1 trip" or "3 trips".
+
+    Args:
+        items: The items to count
+        noun: The singular noun
+
+    Returns:
+        The count followed by the noun
+    """
+    return f"{len(items)} {noun}{'' if len(items) == 1 else 's'}"
@@ -0,0 +1,191 @@
+# services/events.py
+# In-process publish/subscribe hub feeding the Server-Sent Events stream
+
+import json
+import queue
+import threading
+
+# Default most open streams per user; opening one more closes the oldest
+DEFAULT_MAX_SUBSCRIBERS_PER_USER = 5
+
+# Default most undelivered events per stream before it is dropped as too slow
+DEFAULT_QUEUE_SIZE = 100
+
+# Default seconds between heartbeats on an idle stream
+DEFAULT_HEARTBEAT_SECONDS = 15
+
+# Milliseconds browsers wait before reconnecting a closed stream
+RECONNECT_MS = 3000
+
+class Subscription:
+    """
+    One open event stream of a user, with its own bounded event queue.
+    """
+    def __init__(self, user_id, queue_size):
+        """
+        Initialize an open subscription.
+
+        Args:
+            user_id: The ID of the subscribed user
+            queue_size: The most events held for the stream
+        """
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def close(self):
+        """
+        Close the subscription, waking its stream so it ends.
+        """
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            # The stream sees the closed flag on its next heartbeat
+            pass
+
+class EventHub:
+    """
+    Delivers events to the open streams of the users they concern.
+
+    Publishers hand the hub data they already have, and each stream waits
+    on its own queue, so an idle stream only wakes to send a heartbeat and
+    never touches the database. A user can hold a limited number of
+    streams: a new one beyond the limit closes their oldest. A stream
+    whose queue fills up is dropped rather than holding events for a
+    client that is not reading; the browser reconnects on its own.
+    Heartbeats keep proxies from timing out idle streams and let the
+    server notice clients that have gone away.
+    """
+    def __init__(self):
+        """
+        Initialize a hub with no subscribers.
+        """
+        self.max_subscribers_per_user = DEFAULT_MAX_SUBSCRIBERS_PER_USER
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self.heartbeat_seconds = DEFAULT_HEARTBEAT_SECONDS
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Configure the hub from the application settings.
+
+        Args:
+            app: The Flask application
+        """
+        self.max_subscribers_per_user = app.config.get('EVENT_MAX_SUBSCRIBERS_PER_USER', DEFAULT_MAX_SUBSCRIBERS_PER_USER)
+        self.queue_size = app.config.get('EVENT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        self.heartbeat_seconds = app.config.get('EVENT_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+
+    def subscribe(self, user_id):
+        """
+        Open a subscription for a user, closing their oldest one if they
+        are at the limit.
+
+        Args:
+            user_id: The ID of the user
+
+        Returns:
+            The new Subscription
+        """
+        user_id = int(user_id)
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            subscriptions = self._subscribers.setdefault(user_id, [])
+            evicted = subscriptions[:max(0, len(subscriptions) + 1 - self.max_subscribers_per_user)]
+            del subscriptions[:len(evicted)]
+            subscriptions.append(subscription)
+
+        for old in evicted:
+            old.close()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription from the hub.
+
+        Args:
+            subscription: The Subscription to remove
+        """
+        subscription.closed = True
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def publish(self, user_id, event, data):
+        """
+        Send an event to every open stream of a user.
+        Call after the change the event describes has been committed.
+
+        Args:
+            user_id: The ID of the user the event is for
+            event: The event name, e.g. 'new_message' or 'booking_status'
+            data: JSON-serializable event data
+
+        Returns:
+            Number of streams the event was queued for
+        """
+        with self._lock:
+            subscriptions = list(self._subscribers.get(int(user_id), ()))
+        if not subscriptions:
+            return 0
+
+        frame = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        delivered = 0
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(frame)
+                delivered += 1
+            except queue.Full:
+                # The client stopped reading; drop it and let the browser reconnect
+                self.unsubscribe(subscription)
+                subscription.close()
+        return delivered
+
+    def stream(self, subscription):
+        """
+        Generate the Server-Sent Events frames of a subscription until it is
+        closed or the client disconnects.
+
+        Args:
+            subscription: The Subscription to stream
+
+        Returns:
+            Generator of SSE frame strings
+        """
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            while not subscription.closed:
+                try:
+                    frame = subscription.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    # Writing to a client that has gone away ends the generator
+                    yield ": heartbeat\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+    def subscriber_count(self, user_id=None):
+        """
+        Count open subscriptions.
+
+        Args:
+            user_id: Count only this user's subscriptions (optional)
+
+        Returns:
+            The number of open subscriptions
+        """
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(int(user_id), ()))
+            return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+# Shared hub instance
+event_hub = EventHub()
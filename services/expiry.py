@@ -0,0 +1,255 @@
+# services/expiry.py
+# Background scheduler cancelling pending bookings that are not confirmed in time
+
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+# Default hours a pending booking holds a car before it expires
+DEFAULT_HOLD_HOURS = 24
+
+# Longest the scheduler sleeps before re-checking the queue, in seconds
+MAX_WAIT_SECONDS = 300
+
+# Delay before bookings that failed to expire are tried again
+RETRY_DELAY = timedelta(minutes=1)
+
+# Lease taken around each expiry sweep so only one process cancels bookings at a time
+EXPIRY_LEASE = 'expire_pending_bookings'
+LEASE_DURATION = timedelta(minutes=5)
+
+# Most bookings cancelled by one UPDATE statement
+BATCH_SIZE = 500
+
+class BookingExpiryScheduler:
+    """
+    Expires pending bookings once their hold time has passed.
+
+    Due times are kept in a min-heap of (due_at, booking_id), loaded once
+    at startup from the pending bookings and extended as new bookings are
+    reserved. A single daemon thread sleeps until the earliest due time, so
+    the bookings table is never scanned periodically.
+
+    Due bookings are cancelled by a conditional UPDATE that only matches
+    bookings still pending past their hold time, so a booking confirmed in
+    the meantime is left alone. Each sweep runs under a JobLease, so when
+    several processes serve the app only one cancels at a time, and only
+    the rows the UPDATE actually changed are announced to renters.
+    """
+    def __init__(self):
+        """
+        Initialize an empty, stopped scheduler.
+        """
+        self.hold = timedelta(hours=DEFAULT_HOLD_HOURS)
+        self._queue = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._app = None
+        self._stopped = False
+
+    def init_app(self, app):
+        """
+        Attach the scheduler to the application. The thread is started
+        separately by start(), only in the process serving requests.
+
+        Args:
+            app: The Flask application
+        """
+        self._app = app
+        self.hold = timedelta(hours=app.config.get('BOOKING_HOLD_HOURS', DEFAULT_HOLD_HOURS))
+
+    def start(self):
+        """
+        Load the pending bookings and start the scheduler thread, if expiry is enabled.
+        Must be called inside an application context.
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+        from models.booking import Booking
+
+        if not self._app.config.get('BOOKING_EXPIRY_ENABLED', True) or self._thread is not None:
+            return
+
+        rows = db.session.query(Booking.id, Booking.created_at).filter(Booking.status == 'pending')
+        queue = [(created_at + self.hold, booking_id) for booking_id, created_at in rows]
+
+        with self._condition:
+            # Keep bookings scheduled before the thread started
+            queue.extend(self._queue)
+            heapq.heapify(queue)
+            self._queue = queue
+            self._stopped = False
+            self._condition.notify()
+
+        self._thread = threading.Thread(target=self._run, name='booking-expiry', daemon=True)
+        self._thread.start()
+
+    def schedule(self, booking_id, created_at):
+        """
+        Queue a new pending booking for expiry.
+
+        Args:
+            booking_id: The ID of the booking
+            created_at: When the booking was created
+        """
+        with self._condition:
+            heapq.heappush(self._queue, (created_at + self.hold, booking_id))
+            self._condition.notify()
+
+    def pop_due(self, now=None):
+        """
+        Remove and return the bookings whose hold time has passed.
+
+        Args:
+            now: The current time (default: now, in UTC)
+
+        Returns:
+            List of booking IDs in due order
+        """
+        now = now or datetime.utcnow()
+        due = []
+        with self._condition:
+            while self._queue and self._queue[0][0] <= now:
+                due.append(heapq.heappop(self._queue)[1])
+        return due
+
+    def expire(self, booking_ids, now=None):
+        """
+        Cancel the given bookings if they are still pending and past their hold time.
+        Must be called inside an application context.
+
+        Args:
+            booking_ids: IDs of bookings that have come due
+            now: The current time (default: now, in UTC)
+
+        Returns:
+            List of IDs of the bookings that were cancelled, or None if
+            another process is running a sweep
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+        from models.booking import Booking
+        from models.job_lease import JobLease
+        from patterns.observer import BookingManager, EmailNotifier, AppNotifier
+        from .availability import availability_index, bump_booking_versions
+        from .cache import search_cache
+        from .jobs import job_wheel
+
+        if not booking_ids:
+            return []
+
+        now = now or datetime.utcnow()
+        deadline = now - self.hold
+        if not JobLease.acquire(EXPIRY_LEASE, job_wheel.holder, LEASE_DURATION):
+            return None
+
+        expired = []
+        try:
+            booking_ids = list(booking_ids)
+            for start in range(0, len(booking_ids), BATCH_SIZE):
+                batch = booking_ids[start:start + BATCH_SIZE]
+
+                # Only bookings still pending past their hold time are cancelled
+                stamp = datetime.utcnow()
+                updated = db.session.query(Booking).filter(
+                    Booking.id.in_(batch),
+                    Booking.status == 'pending',
+                    Booking.created_at <= deadline
+                ).update({Booking.status: 'cancelled', Booking.updated_at: stamp}, synchronize_session=False)
+
+                if updated:
+                    cancelled = Booking.query.filter(
+                        Booking.id.in_(batch),
+                        Booking.status == 'cancelled',
+                        Booking.updated_at == stamp
+                    ).all()
+                    # Other processes see the change through the cars' booking versions
+                    bump_booking_versions(booking.car_id for booking in cancelled)
+                    expired.extend(cancelled)
+                db.session.commit()
+        finally:
+            JobLease.release(EXPIRY_LEASE, job_wheel.holder)
+
+        if not expired:
+            return []
+
+        # Bulk updates skip the ORM events that normally refresh these
+        availability_index.invalidate({booking.car_id for booking in expired})
+        search_cache.invalidate_booking(
+            min(booking.start_date for booking in expired),
+            max(booking.end_date for booking in expired)
+        )
+
+        booking_manager = BookingManager()
+        booking_manager.attach(EmailNotifier())
+        booking_manager.attach(AppNotifier())
+        for booking in expired:
+            booking_manager.announce_status_change(booking, 'pending', 'cancelled')
+        return [booking.id for booking in expired]
+
+    def stop(self):
+        """
+        Stop the scheduler thread.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __len__(self):
+        """
+        Number of bookings waiting in the queue.
+
+        Returns:
+            The queue length
+        """
+        return len(self._queue)
+
+    def _run(self):
+        """
+        Scheduler thread: sleep until the earliest due time, then expire what is due.
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    wait = MAX_WAIT_SECONDS
+                    if self._queue:
+                        wait = min(wait, (self._queue[0][0] - datetime.utcnow()).total_seconds())
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+                if self._stopped:
+                    return
+
+            due = self.pop_due()
+            with self._app.app_context():
+                try:
+                    if self.expire(due) is None:
+                        # Another process is sweeping; try these again once it is done
+                        self._retry(due)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Failed to expire bookings {due}: {str(e)}")
+                    self._retry(due)
+                finally:
+                    db.session.remove()
+
+    def _retry(self, booking_ids):
+        """
+        Queue bookings to be expired again after RETRY_DELAY.
+
+        Args:
+            booking_ids: IDs of the bookings to retry
+        """
+        retry_at = datetime.utcnow() + RETRY_DELAY
+        with self._condition:
+            for booking_id in booking_ids:
+                heapq.heappush(self._queue, (retry_at, booking_id))
+
+# Shared scheduler instance
+booking_expiry = BookingExpiryScheduler()
@@ -0,0 +1,117 @@
+# services/facets.py
+# Facet counts (price, year, mileage and location) for car search results
+
+# Buckets as (label, minimum, below); ranges are half-open (minimum <= value < below)
+# so every value falls in exactly one bucket, and None is open-ended
+PRICE_BUCKETS = (
+    ('Under $50', None, 50),
+    ('$50 to $99', 50, 100),
+    ('$100 to $199', 100, 200),
+    ('$200 and up', 200, None),
+)
+
+YEAR_BUCKETS = (
+    ('2009 and older', None, 2010),
+    ('2010 to 2014', 2010, 2015),
+    ('2015 to 2019', 2015, 2020),
+    ('2020 and newer', 2020, None),
+)
+
+MILEAGE_BUCKETS = (
+    ('Under 25,000', None, 25000),
+    ('25,000 to 49,999', 25000, 50000),
+    ('50,000 to 99,999', 50000, 100000),
+    ('100,000 and over', 100000, None),
+)
+
+# Range bounds accepted by search criteria and Car.search_query; min_x and
+# max_x are inclusive, below_x is the exclusive upper bound used by facet links
+RANGE_CRITERIA = (
+    'min_price', 'max_price', 'below_price',
+    'min_year', 'max_year', 'below_year',
+    'min_mileage', 'max_mileage', 'below_mileage',
+)
+
+# Number of locations listed in the location facet
+LOCATION_FACET_LIMIT = 10
+
+def _facet_columns():
+    """
+    Get the columns and buckets of each range facet.
+
+    Returns:
+        List of (facet name, column, buckets) tuples; a bucket of facet "x"
+        is selected by the min_x and below_x search criteria
+    """
+    # This import is placed here to avoid circular imports
+    from models.car import Car
+
+    return [
+        ('price', Car.daily_price, PRICE_BUCKETS),
+        ('year', Car.year, YEAR_BUCKETS),
+        ('mileage', Car.mileage, MILEAGE_BUCKETS),
+    ]
+
+def _in_bucket(column, minimum, below):
+    """
+    Build the condition for a value falling in a bucket.
+
+    Args:
+        column: The column to test
+        minimum: The inclusive lower bound, or None
+        below: The exclusive upper bound, or None
+
+    Returns:
+        SQL boolean expression
+    """
+    # This import is placed here to avoid circular imports
+    from app import db
+
+    conditions = []
+    if minimum is not None:
+        conditions.append(column >= minimum)
+    if below is not None:
+        conditions.append(column < below)
+    return db.and_(*conditions)
+
+def facet_counts(query):
+    """
+    Count the cars of a search in each facet bucket.
+
+    All range buckets are counted by a single aggregate query (one
+    SUM(CASE ...) per bucket); locations need a second, grouped query.
+
+    Args:
+        query: The filtered Car query
+
+    Returns:
+        Dictionary with 'total', and 'price', 'year', 'mileage' and 'location'
+        lists of {'label', 'min', 'below', 'count'} (locations use 'value' instead
+        of bounds), leaving out empty buckets
+    """
+    # This import is placed here to avoid circular imports
+    from app import db
+    from models.car import Car
+
+    facets = _facet_columns()
+    aggregates = [db.func.count(Car.id)]
+    for _, column, buckets in facets:
+        for _, minimum, below in buckets:
+            aggregates.append(db.func.sum(db.case((_in_bucket(column, minimum, below), 1), else_=0)))
+
+    row = iter(query.order_by(None).with_entities(*aggregates).one())
+    counts = {'total': next(row) or 0}
+    for name, _, buckets in facets:
+        counts[name] = []
+        for label, minimum, below in buckets:
+            count = next(row) or 0
+            if count:
+                counts[name].append({'label': label, 'min': minimum, 'below': below, 'count': count})
+
+    location_count = db.func.count(Car.id)
+    rows = query.order_by(None).with_entities(Car.location, location_count).group_by(
+        Car.location
+    ).order_by(location_count.desc(), Car.location).limit(LOCATION_FACET_LIMIT)
+    counts['location'] = [{'label': location, 'value': location, 'count': count} for location, count in rows]
+
+    return counts
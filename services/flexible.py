@@ -0,0 +1,76 @@
+# services/flexible.py
+# Flexible-date search: find cars free for any run of consecutive days in a date span
+
+from datetime import timedelta
+
+# Number of possible start dates reported for each car
+FLEXIBLE_START_DATES_LIMIT = 5
+
+def window_starts(bits, length):
+    """
+    Find where runs of consecutive set bits of a given length begin.
+
+    The availability bitmap is ANDed with shifted copies of itself, doubling
+    the covered length each step, so a run of n days takes about log2(n)
+    big-integer operations instead of one pass per day.
+
+    Args:
+        bits: Integer bitmap where bit i is set if day i is available
+        length: The number of consecutive days required
+
+    Returns:
+        Integer bitmap where bit i is set if days i to i + length - 1 are all available
+    """
+    covered = 1
+    starts = bits
+    while covered < length and starts:
+        step = min(covered, length - covered)
+        starts &= starts >> step
+        covered += step
+    return starts
+
+def find_windows(calendars, start_date, end_date, length):
+    """
+    Find the cars with at least one run of available days inside a span.
+
+    Args:
+        calendars: Dictionary mapping car ID to an availability bitmap
+            starting at start_date (see AvailabilityIndex.calendars)
+        start_date: The first day of the span
+        end_date: The last day of the span
+        length: The number of consecutive days required
+
+    Returns:
+        Dictionary mapping each qualifying car ID to its start-date bitmap
+    """
+    # Runs may not extend past the end of the span
+    days = (end_date - start_date).days + 1
+    if length > days:
+        return {}
+    last_start_mask = (1 << (days - length + 1)) - 1
+
+    windows = {}
+    for car_id, bits in calendars.items():
+        starts = window_starts(bits, length) & last_start_mask
+        if starts:
+            windows[car_id] = starts
+    return windows
+
+def start_dates(starts, start_date, limit=FLEXIBLE_START_DATES_LIMIT):
+    """
+    List the earliest start dates in a start-date bitmap.
+
+    Args:
+        starts: Integer bitmap from find_windows
+        start_date: The first day of the span
+        limit: The maximum number of dates to return
+
+    Returns:
+        List of date objects in ascending order
+    """
+    dates = []
+    while starts and len(dates) < limit:
+        lowest = starts & -starts
+        dates.append(start_date + timedelta(days=lowest.bit_length() - 1))
+        starts ^= lowest
+    return dates
@@ -0,0 +1,71 @@
+# services/gazetteer.py
+# Offline gazetteer of place names and their coordinates
+
+# Coordinates (latitude, longitude) keyed by "city, state" in lowercase
+PLACES = {
+    # Michigan and the Detroit metro area
+    'detroit, mi': (42.3314, -83.0458),
+    'dearborn, mi': (42.3223, -83.1763),
+    'dearborn heights, mi': (42.3370, -83.2733),
+    'ann arbor, mi': (42.2808, -83.7430),
+    'ypsilanti, mi': (42.2411, -83.6130),
+    'livonia, mi': (42.3684, -83.3527),
+    'canton, mi': (42.3087, -83.4822),
+    'westland, mi': (42.3242, -83.4002),
+    'taylor, mi': (42.2409, -83.2697),
+    'novi, mi': (42.4806, -83.4755),
+    'farmington hills, mi': (42.4989, -83.3677),
+    'southfield, mi': (42.4734, -83.2219),
+    'royal oak, mi': (42.4895, -83.1446),
+    'troy, mi': (42.6064, -83.1498),
+    'warren, mi': (42.5145, -83.0147),
+    'sterling heights, mi': (42.5803, -83.0302),
+    'pontiac, mi': (42.6389, -83.2910),
+    'flint, mi': (43.0125, -83.6875),
+    'lansing, mi': (42.7325, -84.5555),
+    'east lansing, mi': (42.7370, -84.4839),
+    'grand rapids, mi': (42.9634, -85.6681),
+    'kalamazoo, mi': (42.2917, -85.5872),
+
+    # Major US cities
+    'new york, ny': (40.7128, -74.0060),
+    'buffalo, ny': (42.8864, -78.8784),
+    'boston, ma': (42.3601, -71.0589),
+    'philadelphia, pa': (39.9526, -75.1652),
+    'pittsburgh, pa': (40.4406, -79.9959),
+    'baltimore, md': (39.2904, -76.6122),
+    'washington, dc': (38.9072, -77.0369),
+    'charlotte, nc': (35.2271, -80.8431),
+    'atlanta, ga': (33.7490, -84.3880),
+    'jacksonville, fl': (30.3322, -81.6557),
+    'orlando, fl': (28.5383, -81.3792),
+    'tampa, fl': (27.9506, -82.4572),
+    'miami, fl': (25.7617, -80.1918),
+    'nashville, tn': (36.1627, -86.7816),
+    'cleveland, oh': (41.4993, -81.6944),
+    'columbus, oh': (39.9612, -82.9988),
+    'cincinnati, oh': (39.1031, -84.5120),
+    'toledo, oh': (41.6528, -83.5379),
+    'indianapolis, in': (39.7684, -86.1581),
+    'chicago, il': (41.8781, -87.6298),
+    'milwaukee, wi': (43.0389, -87.9065),
+    'minneapolis, mn': (44.9778, -93.2650),
+    'st louis, mo': (38.6270, -90.1994),
+    'kansas city, mo': (39.0997, -94.5786),
+    'new orleans, la': (29.9511, -90.0715),
+    'houston, tx': (29.7604, -95.3698),
+    'dallas, tx': (32.7767, -96.7970),
+    'austin, tx': (30.2672, -97.7431),
+    'san antonio, tx': (29.4241, -98.4936),
+    'denver, co': (39.7392, -104.9903),
+    'salt lake city, ut': (40.7608, -111.8910),
+    'phoenix, az': (33.4484, -112.0740),
+    'las vegas, nv': (36.1699, -115.1398),
+    'los angeles, ca': (34.0522, -118.2437),
+    'san diego, ca': (32.7157, -117.1611),
+    'san jose, ca': (37.3382, -121.8863),
+    'san francisco, ca': (37.7749, -122.4194),
+    'sacramento, ca': (38.5816, -121.4944),
+    'portland, or': (45.5152, -122.6784),
+    'seattle, wa': (47.6062, -122.3321),
+}
@@ -0,0 +1,189 @@
+# services/geo.py
+# Coordinates, geohash cells and distance calculations for car locations
+
+import math
+import re
+
+from .gazetteer import PLACES
+
+# Geohash alphabet (base32 without a, i, l, o)
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision stored on each car; 9 characters is a cell of a few metres
+GEOHASH_PRECISION = 9
+
+# Mean Earth radius in kilometres
+EARTH_RADIUS_KM = 6371.0088
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def normalize_place(text):
+    """
+    Normalize a place name for gazetteer lookups.
+
+    Args:
+        text: The place name
+
+    Returns:
+        Lowercase name with periods removed and whitespace collapsed
+    """
+    text = text.lower().replace('.', '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+def _build_aliases():
+    """
+    Build the lookup table of place names, including bare city names that
+    appear in only one state.
+
+    Returns:
+        Dictionary mapping normalized names to coordinates
+    """
+    aliases = dict(PLACES)
+    cities = {}
+    for key, coordinates in PLACES.items():
+        city = key.split(',')[0]
+        cities.setdefault(city, []).append(coordinates)
+    for city, matches in cities.items():
+        if len(matches) == 1:
+            aliases.setdefault(city, matches[0])
+    return aliases
+
+_ALIASES = _build_aliases()
+
+def resolve_location(text):
+    """
+    Resolve a free-text location to coordinates using the offline gazetteer.
+    Street addresses are accepted; the first "city, state" pair (or known
+    city name) found in the comma-separated parts is used.
+
+    Args:
+        text: The location text, e.g. "123 Main St, Dearborn, MI"
+
+    Returns:
+        Tuple of (latitude, longitude), or None if no place is recognised
+    """
+    if not text:
+        return None
+
+    parts = [part.strip() for part in normalize_place(text).split(',') if part.strip()]
+
+    # Prefer "city, state" pairs, which are unambiguous
+    for city, state in zip(parts, parts[1:]):
+        coordinates = _ALIASES.get(f"{city}, {state[:2]}")
+        if coordinates:
+            return coordinates
+
+    for part in parts:
+        coordinates = _ALIASES.get(part)
+        if coordinates:
+            return coordinates
+
+    return None
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode coordinates as a geohash.
+
+    Args:
+        latitude: The latitude in degrees
+        longitude: The longitude in degrees
+        precision: Number of geohash characters (default: GEOHASH_PRECISION)
+
+    Returns:
+        The geohash string
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(geohash) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        coordinate, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if coordinate >= middle:
+            value = (value << 1) | 1
+            bounds[0] = middle
+        else:
+            value <<= 1
+            bounds[1] = middle
+        even = not even
+
+        bits += 1
+        if bits == 5:
+            geohash.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+
+    return ''.join(geohash)
+
+def cell_size(precision):
+    """
+    Get the size of a geohash cell in degrees.
+
+    Args:
+        precision: Number of geohash characters
+
+    Returns:
+        Tuple of (latitude span, longitude span) in degrees
+    """
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Find geohash prefixes whose cells together cover a circle.
+
+    The precision is chosen so one cell is at least as large as the radius in
+    both directions; the centre cell and its eight neighbours then cover the
+    whole circle.
+
+    Args:
+        latitude: The latitude of the centre
+        longitude: The longitude of the centre
+        radius_km: The radius in kilometres
+
+    Returns:
+        Sorted list of geohash prefixes
+    """
+    lon_scale = max(math.cos(math.radians(latitude)), 0.01)
+
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        lat_span, lon_span = cell_size(candidate)
+        if lat_span * KM_PER_DEGREE >= radius_km and lon_span * KM_PER_DEGREE * lon_scale >= radius_km:
+            precision = candidate
+            break
+
+    lat_span, lon_span = cell_size(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        for lon_step in (-1, 0, 1):
+            cell_lat = min(max(latitude + lat_step * lat_span, -90.0), 90.0)
+            cell_lon = (longitude + lon_step * lon_span + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(cell_lat, cell_lon, precision))
+    return sorted(cells)
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two points (haversine formula).
+
+    Args:
+        lat1: Latitude of the first point
+        lon1: Longitude of the first point
+        lat2: Latitude of the second point
+        lon2: Longitude of the second point
+
+    Returns:
+        Distance in kilometres
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
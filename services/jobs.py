@@ -0,0 +1,146 @@
+# services/jobs.py
+# Timing wheel running recurring background jobs, guarded by database leases
+
+import os
+import socket
+import threading
+from datetime import timedelta
+
+# Default seconds per wheel tick and number of slots in the wheel
+DEFAULT_TICK_SECONDS = 1
+DEFAULT_SLOTS = 60
+
+class JobWheel:
+    """
+    Hashed timing wheel for recurring jobs.
+
+    The wheel is a ring of slots advanced once per tick. A job due in n
+    ticks goes into slot (current + n) % slots with n // slots full turns
+    left to wait, so each tick only looks at the jobs in one slot no matter
+    how many jobs are registered or how far apart their intervals are.
+
+    Before a job runs, its JobLease is taken for one interval. When several
+    processes serve the app, each has its own wheel but only the lease
+    holder runs the job; the others skip it until the lease lapses.
+    """
+    def __init__(self, tick_seconds=DEFAULT_TICK_SECONDS, slots=DEFAULT_SLOTS):
+        """
+        Initialize an empty, stopped wheel.
+
+        Args:
+            tick_seconds: Seconds per tick (default: DEFAULT_TICK_SECONDS)
+            slots: Number of slots in the wheel (default: DEFAULT_SLOTS)
+        """
+        self.tick_seconds = tick_seconds
+        self.holder = f'{socket.gethostname()}:{os.getpid()}'
+        self._slots = [[] for _ in range(slots)]
+        self._position = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._app = None
+
+    def init_app(self, app):
+        """
+        Attach the wheel to the application. The thread is started
+        separately by start(), only in the process serving requests.
+
+        Args:
+            app: The Flask application
+        """
+        self._app = app
+
+    def start(self):
+        """
+        Start ticking, if jobs are enabled.
+        """
+        if self._app.config.get('JOBS_ENABLED', True) and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='job-wheel', daemon=True)
+            self._thread.start()
+
+    def add(self, name, interval_seconds, func, first_run_seconds=None):
+        """
+        Register a recurring job.
+
+        Args:
+            name: Unique name of the job, also the name of its lease
+            interval_seconds: Seconds between runs
+            func: Callable taking no arguments, run inside an application context
+            first_run_seconds: Seconds until the first run (default: one tick)
+        """
+        job = {'name': name, 'interval': interval_seconds, 'func': func, 'rounds': 0}
+        delay = self.tick_seconds if first_run_seconds is None else first_run_seconds
+        with self._lock:
+            # Registering a name again replaces the earlier job
+            self._slots = [[queued for queued in slot if queued['name'] != name] for slot in self._slots]
+            self._place(job, delay)
+
+    def tick(self):
+        """
+        Advance the wheel one slot and run the jobs that are due.
+        """
+        with self._lock:
+            self._position = (self._position + 1) % len(self._slots)
+            slot = self._slots[self._position]
+            due = [job for job in slot if job['rounds'] == 0]
+            for job in slot:
+                job['rounds'] -= 1
+            self._slots[self._position] = [job for job in slot if job['rounds'] >= 0]
+            for job in due:
+                self._place(job, job['interval'])
+
+        for job in due:
+            self._run_job(job)
+
+    def stop(self):
+        """
+        Stop the wheel thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _place(self, job, delay_seconds):
+        """
+        Put a job into the slot it falls due in. The caller holds the lock.
+
+        Args:
+            job: The job dictionary
+            delay_seconds: Seconds from now until the job is due
+        """
+        ticks = max(1, round(delay_seconds / self.tick_seconds))
+        job['rounds'] = (ticks - 1) // len(self._slots)
+        self._slots[(self._position + ticks) % len(self._slots)].append(job)
+
+    def _run_job(self, job):
+        """
+        Run a job if this process can take its lease.
+
+        Args:
+            job: The job dictionary
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+        from models.job_lease import JobLease
+
+        with self._app.app_context():
+            try:
+                if JobLease.acquire(job['name'], self.holder, timedelta(seconds=job['interval'])):
+                    job['func']()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Job {job['name']} failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        """
+        Wheel thread: tick until stopped.
+        """
+        while not self._stop.wait(self.tick_seconds):
+            self.tick()
+
+# Shared wheel instance
+job_wheel = JobWheel()
@@ -0,0 +1,257 @@
+# services/pagination.py
+# Keyset (cursor-based) pagination helpers
+
+import base64
+import json
+import math
+from datetime import date, datetime
+
+# Range of integers a cursor may carry; larger ones cannot be bound as SQL parameters
+MIN_CURSOR_INT = -2 ** 63
+MAX_CURSOR_INT = 2 ** 63 - 1
+
+class Page:
+    """
+    One page of results plus the cursor for the page after it.
+    """
+    def __init__(self, items, next_cursor=None):
+        """
+        Initialize the page.
+
+        Args:
+            items: The items on this page
+            next_cursor: Opaque token for the next page, None on the last page
+        """
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        """
+        Whether there is another page after this one.
+
+        Returns:
+            True if a next page exists, False otherwise
+        """
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        """
+        Iterate over the items on the page.
+
+        Returns:
+            Iterator over the items
+        """
+        return iter(self.items)
+
+    def __len__(self):
+        """
+        Number of items on the page.
+
+        Returns:
+            The item count
+        """
+        return len(self.items)
+
+def encode_cursor(values):
+    """
+    Encode the sort key of the last item on a page as an opaque token.
+
+    Args:
+        values: List of sort key values (numbers, strings, dates or datetimes)
+
+    Returns:
+        URL-safe cursor string
+    """
+    encoded = []
+    for value in values:
+        if isinstance(value, datetime):
+            encoded.append({'dt': value.isoformat()})
+        elif isinstance(value, date):
+            encoded.append({'d': value.isoformat()})
+        else:
+            encoded.append(value)
+    raw = json.dumps(encoded, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The cursor string
+        size: The number of sort key values expected
+
+    Returns:
+        List of sort key values
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        encoded = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(encoded, list) or len(encoded) != size:
+        raise ValueError("Invalid cursor")
+
+    values = []
+    for value in encoded:
+        try:
+            if isinstance(value, dict) and 'dt' in value:
+                values.append(datetime.fromisoformat(value['dt']))
+            elif isinstance(value, dict) and 'd' in value:
+                values.append(date.fromisoformat(value['d']))
+            elif isinstance(value, str) or _is_key_number(value):
+                values.append(value)
+            else:
+                # Sort keys are never null, booleans, out-of-range numbers or nested structures
+                raise ValueError("Invalid cursor")
+        except TypeError:
+            raise ValueError("Invalid cursor")
+    return values
+
+def decode_id_cursor(cursor):
+    """
+    Decode a cursor holding a single row ID, as used by message pages.
+
+    Args:
+        cursor: The cursor string
+
+    Returns:
+        The ID
+
+    Raises:
+        ValueError: If the cursor is malformed or does not hold an integer
+    """
+    value, = decode_cursor(cursor, 1)
+    if type(value) is not int:
+        raise ValueError("Invalid cursor")
+    return value
+
+def _is_key_number(value):
+    """
+    Check whether a decoded value is a number a sort key can hold.
+
+    Args:
+        value: The decoded JSON value
+
+    Returns:
+        True for 64-bit integers and finite floats, False otherwise
+        (booleans, NaN, infinities and out-of-range integers included)
+    """
+    if type(value) is int:
+        return MIN_CURSOR_INT <= value <= MAX_CURSOR_INT
+    return type(value) is float and math.isfinite(value)
+
+def _check_types(order, values):
+    """
+    Check that decoded cursor values match the types of the columns they key.
+
+    Args:
+        order: List of (column, descending) pairs
+        values: Decoded sort key values
+
+    Raises:
+        ValueError: If a value has the wrong type for its column
+    """
+    for (column, _), value in zip(order, values):
+        try:
+            expected = column.type.python_type
+        except NotImplementedError:
+            continue
+        # Integer keys are valid for float columns, and dates are not datetimes
+        if expected is float:
+            expected = (int, float)
+        if not isinstance(value, expected) or (expected is date and isinstance(value, datetime)):
+            raise ValueError("Invalid cursor")
+
+def keyset_filter(order, values):
+    """
+    Build the filter selecting rows that sort after a given key.
+
+    For order [(a, False), (b, True)] and values [x, y] this is
+    a > x OR (a = x AND b < y).
+
+    Args:
+        order: List of (column, descending) pairs; the last column must be unique
+        values: Sort key values of the last row already returned
+
+    Returns:
+        SQL expression for use in a query filter
+    """
+    # This import is placed here to avoid circular imports
+    from app import db
+
+    clauses = []
+    for position, (column, descending) in enumerate(order):
+        equal_prefix = [order[i][0] == values[i] for i in range(position)]
+        after = column < values[position] if descending else column > values[position]
+        clauses.append(db.and_(*equal_prefix, after))
+    return db.or_(*clauses)
+
+def paginate(query, order, cursor=None, per_page=20):
+    """
+    Fetch one page of a query using keyset pagination.
+
+    Only per_page + 1 rows are read, however deep the page is.
+
+    Args:
+        query: The query to paginate
+        order: List of (column, descending) pairs; the last column must be unique
+        cursor: Cursor from the previous page (optional)
+        per_page: The number of items per page (default: 20)
+
+    Returns:
+        Page of results
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(order))
+        _check_types(order, values)
+        query = query.filter(keyset_filter(order, values))
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in order])
+
+    return Page(rows, next_cursor)
+
+def paginate_list(items, key, cursor=None, per_page=20):
+    """
+    Keyset-paginate a list that is already sorted in memory.
+
+    Args:
+        items: The sorted items
+        key: Function returning an item's sort key as a list of values
+        cursor: Cursor from the previous page (optional)
+        per_page: The number of items per page (default: 20)
+
+    Returns:
+        Page of results
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor and items:
+        last_key = decode_cursor(cursor, len(key(items[0])))
+        try:
+            items = [item for item in items if key(item) > last_key]
+        except TypeError:
+            # A cursor whose values cannot be compared with these sort keys
+            raise ValueError("Invalid cursor")
+
+    page_items = items[:per_page]
+    next_cursor = None
+    if len(items) > per_page:
+        next_cursor = encode_cursor(key(page_items[-1]))
+    return Page(page_items, next_cursor)
@@ -0,0 +1,45 @@
+# services/pricing.py
+# Rental price quotes, shared by bookings, payments, notifications and search results
+
+def rental_days(start_date, end_date):
+    """
+    Count the days of a rental; both the start and end dates are charged.
+
+    Args:
+        start_date: The first day of the rental
+        end_date: The last day of the rental
+
+    Returns:
+        The number of days
+    """
+    return (end_date - start_date).days + 1
+
+def quote(daily_price, start_date, end_date):
+    """
+    Quote the total price of a rental.
+
+    Args:
+        daily_price: The car's daily price
+        start_date: The first day of the rental
+        end_date: The last day of the rental
+
+    Returns:
+        The total price, rounded to cents
+    """
+    return round(rental_days(start_date, end_date) * daily_price, 2)
+
+def quote_many(cars, start_date, end_date):
+    """
+    Quote the same rental period for a list of cars in one pass.
+    The day count is worked out once and applied to every car.
+
+    Args:
+        cars: Iterable of Car objects
+        start_date: The first day of the rental
+        end_date: The last day of the rental
+
+    Returns:
+        Dictionary mapping car ID to total price, rounded to cents
+    """
+    days = rental_days(start_date, end_date)
+    return {car.id: round(days * car.daily_price, 2) for car in cars}
@@ -0,0 +1,187 @@
+# services/ranking.py
+# Relevance ranking of car search candidates
+
+import math
+import statistics
+from datetime import datetime
+
+from .geo import EARTH_RADIUS_KM
+
+# Sort mode that orders results by relevance score
+RELEVANCE_SORT = 'relevance'
+
+# Default weight of each signal in the relevance score
+DEFAULT_RANKING_WEIGHTS = {
+    'price': 0.35,
+    'distance': 0.30,
+    'year': 0.20,
+    'recency': 0.15,
+}
+
+# Most candidates scored per search; beyond this only the newest listings are scored
+DEFAULT_CANDIDATE_LIMIT = 2000
+
+# Geohash prefix length grouping cars for the local median price (cells of about 40 x 20 km)
+LOCAL_AREA_PRECISION = 4
+
+# Fewest cars in an area for its own median price to be used
+LOCAL_MEDIAN_MIN_CARS = 3
+
+# Distance at which the distance signal halves, and listing age at which recency halves
+DISTANCE_SCALE_KM = 25
+RECENCY_HALF_LIFE_DAYS = 30
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+class CarRanker:
+    """
+    Scores search candidates on price, distance, model year and listing age.
+
+    Each signal is normalized to roughly 0..1 (price to -1..1) and the
+    signals are combined with configurable weights:
+
+    - price: how far below the median price of nearby cars the car is
+    - distance: closeness to the searched place, when one is known
+    - year: model year relative to the newest and oldest candidates
+    - recency: how recently the car was listed
+    """
+    def __init__(self):
+        """
+        Initialize the ranker with the default settings.
+        """
+        self.weights = dict(DEFAULT_RANKING_WEIGHTS)
+        self.candidate_limit = DEFAULT_CANDIDATE_LIMIT
+
+    def init_app(self, app):
+        """
+        Configure the ranker from the application settings.
+
+        Args:
+            app: The Flask application
+        """
+        self.weights = dict(DEFAULT_RANKING_WEIGHTS, **app.config.get('RANKING_WEIGHTS', {}))
+        self.candidate_limit = app.config.get('RANKING_CANDIDATE_LIMIT', DEFAULT_CANDIDATE_LIMIT)
+
+    def candidates(self, query, max_id=None):
+        """
+        Fetch the columns the ranker needs for the cars of a search.
+
+        The query already carries the search's text, range and date filters,
+        so the limit only applies to cars that match them. When more match,
+        the newest listings are kept and the caller is told.
+
+        Args:
+            query: The filtered Car query
+            max_id: Leave out cars with a higher ID, i.e. listed after the
+                first page was ranked (optional)
+
+        Returns:
+            Tuple of (rows, truncated): rows with id, daily_price, year,
+            created_at, latitude, longitude and geohash, newest listings
+            first, and whether matching cars were left out by the limit
+        """
+        # This import is placed here to avoid circular imports
+        from models.car import Car
+
+        if max_id is not None:
+            query = query.filter(Car.id <= max_id)
+
+        rows = query.order_by(None).with_entities(
+            Car.id, Car.daily_price, Car.year, Car.created_at, Car.latitude, Car.longitude, Car.geohash
+        ).order_by(Car.created_at.desc(), Car.id.desc()).limit(self.candidate_limit + 1).all()
+        return rows[:self.candidate_limit], len(rows) > self.candidate_limit
+
+    def rank(self, candidates, origin=None, today=None):
+        """
+        Score candidates and order them best first.
+
+        Args:
+            candidates: Rows or Car objects with id, daily_price, year,
+                created_at, latitude, longitude and geohash
+            origin: Tuple of (latitude, longitude) of the searched place (optional)
+            today: The date listing ages are measured from (default: today)
+
+        Returns:
+            List of (car ID, score) tuples, highest score first, ties by car ID
+        """
+        if not candidates:
+            return []
+
+        today = today or datetime.utcnow().date()
+        price_weight = self.weights['price']
+        distance_weight = self.weights['distance']
+        year_weight = self.weights['year']
+        recency_weight = self.weights['recency']
+
+        medians = self._local_medians(candidates)
+        default_median = medians[None]
+
+        years = [car.year for car in candidates]
+        oldest = min(years)
+        year_span = max(years) - oldest
+
+        # Distances use the equirectangular approximation, which is close to
+        # the great-circle distance at the scales that affect the score
+        if origin:
+            origin_lat, origin_lon = origin
+            lon_scale = math.cos(math.radians(origin_lat))
+
+        # Listings share few distinct creation dates, so recency is worked out once per date
+        recency_by_date = {}
+
+        ranked = []
+        for car in candidates:
+            geohash = car.geohash
+            median = medians.get(geohash[:LOCAL_AREA_PRECISION], default_median) if geohash else default_median
+            price = (median - car.daily_price) / median if median else 0.0
+            if price < -1.0:
+                price = -1.0
+            elif price > 1.0:
+                price = 1.0
+
+            distance = 0.0
+            if origin and car.latitude is not None and car.longitude is not None:
+                d_lat = car.latitude - origin_lat
+                d_lon = (car.longitude - origin_lon) * lon_scale
+                distance = 1.0 / (1.0 + math.hypot(d_lat, d_lon) * KM_PER_DEGREE / DISTANCE_SCALE_KM)
+
+            year = (car.year - oldest) / year_span if year_span else 0.5
+
+            recency = 1.0
+            if car.created_at:
+                created = car.created_at.date()
+                recency = recency_by_date.get(created)
+                if recency is None:
+                    age_days = max((today - created).days, 0)
+                    recency = recency_by_date[created] = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+            score = price_weight * price + distance_weight * distance + year_weight * year + recency_weight * recency
+            ranked.append((car.id, score))
+
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked
+
+    @staticmethod
+    def _local_medians(candidates):
+        """
+        Work out the median daily price of each area with enough cars.
+
+        Args:
+            candidates: The cars being ranked
+
+        Returns:
+            Dictionary mapping geohash prefix to median price, with the
+            median of all candidates under the key None
+        """
+        areas = {}
+        for car in candidates:
+            if car.geohash:
+                areas.setdefault(car.geohash[:LOCAL_AREA_PRECISION], []).append(car.daily_price)
+
+        medians = {area: statistics.median(prices) for area, prices in areas.items() if len(prices) >= LOCAL_MEDIAN_MIN_CARS}
+        medians[None] = statistics.median(car.daily_price for car in candidates)
+        return medians
+
+# Shared ranker instance
+car_ranker = CarRanker()
@@ -0,0 +1,165 @@
+# services/reservations.py
+# Reservation engine making the booking overlap check and insert atomic per car
+
+import random
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+# Default number of retries after losing a race for the same car
+DEFAULT_MAX_RETRIES = 3
+
+# Base delay in seconds before a retry; later retries wait longer
+DEFAULT_RETRY_DELAY = 0.05
+
+# Number of locks cars are spread over within one process
+LOCK_STRIPES = 64
+
+class ReservationEngine:
+    """
+    Creates bookings so that two requests can never double-book a car.
+
+    Each reservation reads the car's booking_version, checks for
+    overlapping active bookings, inserts the booking and then bumps the
+    version only if it is unchanged, all in one transaction. If another
+    reservation for the same car committed in between, the version no
+    longer matches, the transaction is rolled back and the reservation is
+    retried from the overlap check, a bounded number of times.
+
+    Within a process, reservations for the same car are also serialized on
+    a striped lock so they queue instead of racing. There is no global
+    lock: reservations for cars on different stripes, and in different
+    processes, run in parallel and only conflict on the same car row.
+    """
+    def __init__(self):
+        """
+        Initialize the engine with the default settings.
+        """
+        self.max_retries = DEFAULT_MAX_RETRIES
+        self.retry_delay = DEFAULT_RETRY_DELAY
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def init_app(self, app):
+        """
+        Configure the engine from the application settings.
+
+        Args:
+            app: The Flask application
+        """
+        self.max_retries = app.config.get('RESERVATION_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+        self.retry_delay = app.config.get('RESERVATION_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+
+    def reserve(self, car_id, renter_id, start_date, end_date, status='pending'):
+        """
+        Book a car for a date range if no active booking overlaps it.
+
+        Args:
+            car_id: The ID of the car being booked
+            renter_id: The ID of the user making the booking
+            start_date: The start date of the booking
+            end_date: The end date of the booking
+            status: The status of the new booking (default: 'pending')
+
+        Returns:
+            The newly created, committed Booking object
+
+        Raises:
+            ValueError: If the car does not exist, is not offered for the
+                dates or is already booked, or if the retries run out
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+        from .cache import search_cache
+        from .expiry import booking_expiry
+
+        with self._locks[car_id % LOCK_STRIPES]:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    time.sleep(self.retry_delay * attempt * random.uniform(0.5, 1.5))
+
+                try:
+                    booking = self._try_reserve(car_id, renter_id, start_date, end_date, status)
+                except OperationalError:
+                    # The database was busy with another writer; try again
+                    db.session.rollback()
+                    continue
+                except ValueError:
+                    db.session.rollback()
+                    raise
+
+                if booking is None:
+                    db.session.rollback()
+                    continue
+
+                search_cache.invalidate_booking(start_date, end_date)
+                if booking.status == 'pending':
+                    booking_expiry.schedule(booking.id, booking.created_at)
+                return booking
+
+        raise ValueError("The car is being booked by someone else right now. Please try again.")
+
+    @staticmethod
+    def _try_reserve(car_id, renter_id, start_date, end_date, status):
+        """
+        Make one attempt at a reservation.
+
+        Args:
+            car_id: The ID of the car being booked
+            renter_id: The ID of the user making the booking
+            start_date: The start date of the booking
+            end_date: The end date of the booking
+            status: The status of the new booking
+
+        Returns:
+            The committed Booking, or None if another reservation for the
+            car committed first and the caller should roll back and retry
+
+        Raises:
+            ValueError: If the car does not exist, is not offered for the
+                dates or is already booked
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+        from models.booking import Booking
+        from models.car import Car
+
+        car = db.session.query(
+            Car.booking_version, Car.availability_start, Car.availability_end
+        ).filter(Car.id == car_id).first()
+        if car is None:
+            raise ValueError("Car not found")
+
+        if start_date < car.availability_start or end_date > car.availability_end:
+            raise ValueError("The car is not available for the selected dates.")
+
+        if Booking.has_overlap(car_id, start_date, end_date):
+            raise ValueError("The car is already booked for the requested period")
+
+        booking = Booking(
+            car_id=car_id,
+            renter_id=renter_id,
+            start_date=start_date,
+            end_date=end_date,
+            status=status
+        )
+        db.session.add(booking)
+
+        # Claim the car: succeeds only if no other reservation bumped the version since it was read.
+        # updated_at is kept so a reservation does not look like a listing edit.
+        version = car.booking_version or 0
+        claimed = db.session.query(Car).filter(
+            Car.id == car_id,
+            db.func.coalesce(Car.booking_version, 0) == version
+        ).update(
+            {Car.booking_version: version + 1, Car.updated_at: Car.updated_at},
+            synchronize_session=False
+        )
+        if not claimed:
+            return None
+
+        db.session.commit()
+        return booking
+
+# Shared engine instance
+reservation_engine = ReservationEngine()
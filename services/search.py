@@ -0,0 +1,322 @@
+# services/search.py
+# Car search service shared by the listing page, its JSON endpoint and the SearchComponent
+
+from datetime import date, datetime, timedelta
+
+from .cache import search_cache
+from .facets import RANGE_CRITERIA, facet_counts
+from .flexible import find_windows, start_dates
+from .geo import resolve_location
+from .pagination import Page, decode_cursor, paginate_list
+from .pricing import quote_many
+from .ranking import RELEVANCE_SORT, car_ranker
+
+# Default radius for "near" searches and result count when no radius is given
+DEFAULT_SEARCH_RADIUS_KM = 25
+NEAREST_RESULT_LIMIT = 20
+
+class SearchResults:
+    """
+    Results of a car search: one page of cars plus details about how they matched.
+    """
+    def __init__(self, page, distances=None, errors=None, facets=None, start_dates=None, truncated=False):
+        """
+        Initialize the results.
+
+        Args:
+            page: Page of matching cars
+            distances: Dictionary of distance in km by car ID (radius searches only)
+            errors: List of messages explaining why criteria were ignored
+            facets: Facet counts from services.facets (first page only)
+            start_dates: Dictionary of possible start dates by car ID (flexible searches only)
+            truncated: Whether only the newest matches were ranked (relevance searches only)
+        """
+        # Total price by car ID for the searched dates, filled in by CarSearchService
+        self.quotes = {}
+        self.page = page
+        self.distances = distances or {}
+        self.errors = errors or []
+        self.facets = facets or {}
+        self.start_dates = start_dates or {}
+        self.truncated = truncated
+
+    @property
+    def cars(self):
+        """
+        The cars on this page of results.
+
+        Returns:
+            List of Car objects
+        """
+        return self.page.items
+
+    @property
+    def next_cursor(self):
+        """
+        Cursor for the next page of results.
+
+        Returns:
+            The cursor string, or None on the last page
+        """
+        return self.page.next_cursor
+
+    def __len__(self):
+        """
+        Number of cars on this page of results.
+
+        Returns:
+            The car count
+        """
+        return len(self.page)
+
+class CarSearchService:
+    """
+    Runs car searches with a single set of rules for every caller.
+
+    Criteria is a dictionary that may contain: location, keywords,
+    start_date, end_date (date objects), near (place name), radius_km,
+    the range bounds in RANGE_CRITERIA, trip_days, sort (a key of
+    SORT_MODES; near-searches sort by distance unless sorting by
+    relevance), cursor and per_page.
+    Booked cars are excluded whenever both dates are given. With trip_days,
+    the dates are a span and any trip_days consecutive free days qualify. The first page also carries
+    facet counts. Results are served from search_cache when possible.
+    """
+    def search(self, criteria):
+        """
+        Search for cars matching the criteria.
+
+        Args:
+            criteria: Dictionary of search criteria
+
+        Returns:
+            SearchResults for the requested page
+        """
+        results = self._from_cache(criteria)
+        if results is None:
+            results = self._run(criteria)
+            search_cache.put(criteria, results)
+
+        # Price the page for the searched dates; a flexible search prices one trip
+        start_date = criteria.get('start_date')
+        end_date = criteria.get('end_date')
+        if start_date and end_date:
+            if criteria.get('trip_days'):
+                end_date = start_date + timedelta(days=criteria['trip_days'] - 1)
+            results.quotes = quote_many(results.cars, start_date, end_date)
+        return results
+
+    def _from_cache(self, criteria):
+        """
+        Rebuild the results of a cached search with a single primary key query.
+
+        Args:
+            criteria: Dictionary of search criteria
+
+        Returns:
+            SearchResults, or None if the search is not cached or a cached car is gone
+        """
+        # This import is placed here to avoid circular imports
+        from models.car import Car
+
+        entry = search_cache.get(criteria)
+        if entry is None:
+            return None
+
+        cars = []
+        if entry.car_ids:
+            cars_by_id = {car.id: car for car in Car.query.filter(Car.id.in_(entry.car_ids))}
+            if len(cars_by_id) != len(entry.car_ids):
+                return None
+            cars = [cars_by_id[car_id] for car_id in entry.car_ids]
+
+        return SearchResults(
+            Page(cars, entry.next_cursor), dict(entry.distances), list(entry.errors),
+            entry.facets, dict(entry.start_dates), entry.truncated
+        )
+
+    def _run(self, criteria):
+        """
+        Run a search against the database.
+
+        Args:
+            criteria: Dictionary of search criteria
+
+        Returns:
+            SearchResults for the requested page
+        """
+        # This import is placed here to avoid circular imports
+        from database import id_table
+        from models.car import Car
+
+        cursor = criteria.get('cursor')
+        per_page = criteria.get('per_page') or 20
+
+        start_date = criteria.get('start_date')
+        end_date = criteria.get('end_date')
+        if not (start_date and end_date):
+            start_date = end_date = None
+        trip_days = criteria.get('trip_days') if start_date else None
+
+        ranges = {name: criteria[name] for name in RANGE_CRITERIA if criteria.get(name) is not None}
+        query = Car.search_query(
+            criteria.get('location'),
+            None if trip_days else start_date,
+            None if trip_days else end_date,
+            criteria.get('keywords'),
+            **ranges
+        )
+
+        # Flexible dates: narrow the search to cars with a free run of trip_days
+        windows = {}
+        if trip_days:
+            windows = self._find_windows(query, start_date, end_date, trip_days)
+            query = query.filter(Car.id.in_(id_table('search_window_cars', windows)))
+
+        try:
+            if criteria.get('near'):
+                results = self._search_near(query, criteria, cursor, per_page)
+            elif criteria.get('sort') == RELEVANCE_SORT:
+                results = self._search_ranked(query, criteria, cursor, per_page)
+            else:
+                page = Car.search_page(query, cursor=cursor, per_page=per_page, sort=criteria.get('sort'))
+                results = SearchResults(page, facets=facet_counts(query) if not cursor else None)
+        except ValueError:
+            results = SearchResults(Page([]), errors=['Invalid page token.'])
+
+        if windows:
+            results.start_dates = {car.id: start_dates(windows[car.id], start_date) for car in results.cars}
+        return results
+
+    def _find_windows(self, query, start_date, end_date, trip_days):
+        """
+        Find the cars in a query that are free for trip_days consecutive days
+        somewhere between start_date and end_date.
+
+        Uses one query for the candidates' availability periods and the
+        availability index's per-day bitmaps for their bookings.
+
+        Args:
+            query: The filtered Car query, without date filters
+            start_date: The first day of the span
+            end_date: The last day of the span
+            trip_days: The number of consecutive days required
+
+        Returns:
+            Dictionary mapping each qualifying car ID to its start-date bitmap
+        """
+        # This import is placed here to avoid circular imports
+        from models.car import Car
+        from .availability import availability_index
+
+        rows = query.order_by(None).filter(
+            Car.availability_start <= end_date,
+            Car.availability_end >= start_date
+        ).with_entities(Car.id, Car.availability_start, Car.availability_end)
+
+        periods = {car_id: (availability_start, availability_end) for car_id, availability_start, availability_end in rows}
+        calendars = availability_index.calendars(periods, start_date, end_date)
+        return find_windows(calendars, start_date, end_date, trip_days)
+
+    def _search_ranked(self, query, criteria, cursor, per_page):
+        """
+        Search with results ordered by relevance score, best first.
+
+        Candidates are fetched as plain columns in one query, scored in
+        memory by car_ranker, and only the cars on the requested page are
+        loaded. Distance is scored from the searched location when it can
+        be placed. The cursor also carries the highest candidate ID and the
+        date the first page was ranked on, so later pages score the same
+        cars the same way and no car moves across a page boundary.
+
+        Args:
+            query: The filtered Car query
+            criteria: Dictionary of search criteria
+            cursor: Cursor from the previous page (optional)
+            per_page: The number of cars per page
+
+        Returns:
+            SearchResults for the requested page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        # This import is placed here to avoid circular imports
+        from models.car import Car
+
+        max_id = ranked_on = None
+        if cursor:
+            max_id, ranked_on, _, _ = decode_cursor(cursor, 4)
+            if type(max_id) is not int or type(ranked_on) is not date:
+                raise ValueError("Invalid cursor")
+
+        origin = resolve_location(criteria['location']) if criteria.get('location') else None
+        candidates, truncated = car_ranker.candidates(query, max_id=max_id)
+        if max_id is None and candidates:
+            max_id = max(candidate.id for candidate in candidates)
+        ranked_on = ranked_on or datetime.utcnow().date()
+
+        ranked = car_ranker.rank(candidates, origin=origin, today=ranked_on)
+        page = paginate_list(ranked, key=lambda item: [max_id, ranked_on, -item[1], item[0]], cursor=cursor, per_page=per_page)
+
+        car_ids = [car_id for car_id, _ in page.items]
+        cars_by_id = {car.id: car for car in Car.query.filter(Car.id.in_(car_ids))} if car_ids else {}
+        cars = [cars_by_id[car_id] for car_id in car_ids if car_id in cars_by_id]
+        return SearchResults(
+            Page(cars, page.next_cursor),
+            facets=facet_counts(query) if not cursor else None,
+            truncated=truncated
+        )
+
+    def _search_near(self, query, criteria, cursor, per_page):
+        """
+        Search around a named place, closest cars first.
+
+        Args:
+            query: The filtered Car query
+            criteria: Dictionary of search criteria
+            cursor: Cursor from the previous page (optional)
+            per_page: The number of cars per page
+
+        Returns:
+            SearchResults for the requested page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        # This import is placed here to avoid circular imports
+        from database import id_table
+        from models.car import Car
+
+        origin = resolve_location(criteria['near'])
+        if origin is None:
+            message = f'Could not find a place called "{criteria["near"]}". Try "City, State".'
+            return SearchResults(Page([]), errors=[message])
+
+        radius_km = criteria.get('radius_km')
+        nearby = Car.search_nearby(
+            origin[0], origin[1],
+            radius_km=radius_km,
+            limit=None if radius_km else NEAREST_RESULT_LIMIT,
+            query=query
+        )
+
+        distances = {car.id: distance for car, distance in nearby}
+        cars = [car for car, _ in nearby]
+        key = lambda car: [distances[car.id], car.id]
+
+        if criteria.get('sort') == RELEVANCE_SORT:
+            scores = dict(car_ranker.rank(cars, origin=origin))
+            cars.sort(key=lambda car: (-scores[car.id], car.id))
+            key = lambda car: [-scores[car.id], car.id]
+
+        page = paginate_list(cars, key=key, cursor=cursor, per_page=per_page)
+
+        # Facets cover every car found around the point, not just this page
+        facets = None
+        if not cursor:
+            facets = facet_counts(query.filter(Car.id.in_(id_table('search_near_cars', distances)))) if distances else {'total': 0}
+        return SearchResults(page, distances=distances, facets=facets)
+
+# Shared service instance
+car_search_service = CarSearchService()
@@ -0,0 +1,196 @@
+# services/suggest.py
+# In-memory prefix index of car locations for search-box autocomplete
+
+import bisect
+import re
+import threading
+
+# Default and maximum number of suggestions returned
+SUGGESTION_LIMIT = 8
+MAX_SUGGESTION_LIMIT = 20
+
+# Number of answered prefixes remembered between writes
+MEMO_SIZE = 1024
+
+def clean_location(text):
+    """
+    Collapse whitespace in a location for display.
+
+    Args:
+        text: The location text
+
+    Returns:
+        The text with runs of whitespace replaced by single spaces
+    """
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+def normalize_location(text):
+    """
+    Normalize a location so equivalent spellings share one suggestion.
+
+    Args:
+        text: The location text
+
+    Returns:
+        Lowercase text with whitespace collapsed, e.g. "detroit, mi"
+    """
+    return clean_location(text).lower()
+
+class LocationIndex:
+    """
+    Sorted array of location fragments answering prefix lookups with bisect.
+
+    Every distinct normalized location is stored once with its listing
+    count. Each comma-separated tail of a location ("123 main st, detroit,
+    mi", "detroit, mi", "mi") is a fragment, so typing any part of an
+    address finds it. The index is loaded once at startup and then kept up
+    to date by add() and remove() as listings change; lookups never touch
+    the database. Answers are memoized until the next write, so short,
+    popular prefixes are only scanned once.
+    """
+    def __init__(self):
+        """
+        Initialize an empty index.
+        """
+        self._locations = {}
+        self._fragments = []
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Load the index from the cars table.
+        Must be called inside an application context.
+
+        Args:
+            app: The Flask application
+        """
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Reload every location and its listing count with one grouped query.
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+        from models.car import Car
+
+        rows = db.session.query(Car.location, db.func.count(Car.id)).group_by(Car.location).all()
+
+        locations = {}
+        for location, count in rows:
+            key = normalize_location(location)
+            if not key:
+                continue
+            display, total = locations.get(key, (clean_location(location), 0))
+            locations[key] = (display, total + count)
+
+        fragments = sorted(fragment for key in locations for fragment in self._fragments_of(key))
+
+        with self._lock:
+            self._locations = locations
+            self._fragments = fragments
+            self._memo.clear()
+
+    def add(self, location):
+        """
+        Count a new listing at a location.
+
+        Args:
+            location: The listing's location text
+        """
+        key = normalize_location(location)
+        if not key:
+            return
+
+        with self._lock:
+            self._memo.clear()
+            display, count = self._locations.get(key, (clean_location(location), 0))
+            if count == 0:
+                for fragment in self._fragments_of(key):
+                    bisect.insort(self._fragments, fragment)
+            self._locations[key] = (display, count + 1)
+
+    def remove(self, location):
+        """
+        Stop counting a listing at a location, dropping the location with its last listing.
+
+        Args:
+            location: The listing's location text
+        """
+        key = normalize_location(location)
+        with self._lock:
+            if key not in self._locations:
+                return
+
+            self._memo.clear()
+            display, count = self._locations[key]
+            if count > 1:
+                self._locations[key] = (display, count - 1)
+                return
+
+            del self._locations[key]
+            for fragment in self._fragments_of(key):
+                position = bisect.bisect_left(self._fragments, fragment)
+                if position < len(self._fragments) and self._fragments[position] == fragment:
+                    del self._fragments[position]
+
+    def suggest(self, prefix, limit=SUGGESTION_LIMIT):
+        """
+        Find locations with a part starting with the typed text.
+
+        Args:
+            prefix: The text typed so far
+            limit: The maximum number of suggestions (default: SUGGESTION_LIMIT)
+
+        Returns:
+            List of {'location', 'count'} dictionaries, most listings first
+        """
+        prefix = normalize_location(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            suggestions = self._memo.get((prefix, limit))
+            if suggestions is None:
+                matches = set()
+                position = bisect.bisect_left(self._fragments, (prefix,))
+                while position < len(self._fragments) and self._fragments[position][0].startswith(prefix):
+                    matches.add(self._fragments[position][1])
+                    position += 1
+
+                found = sorted((self._locations[key] for key in matches), key=lambda item: (-item[1], item[0].lower()))
+                suggestions = tuple(found[:limit])
+
+                if len(self._memo) >= MEMO_SIZE:
+                    self._memo.clear()
+                self._memo[(prefix, limit)] = suggestions
+
+        return [{'location': display, 'count': count} for display, count in suggestions]
+
+    def __len__(self):
+        """
+        Number of distinct locations in the index.
+
+        Returns:
+            The location count
+        """
+        return len(self._locations)
+
+    @staticmethod
+    def _fragments_of(key):
+        """
+        Get the searchable fragments of a normalized location.
+
+        Args:
+            key: The normalized location
+
+        Returns:
+            List of (fragment, key) tuples, one per comma-separated tail
+        """
+        parts = [part.strip() for part in key.split(',')]
+        tails = {', '.join(part for part in parts[i:] if part) for i in range(len(parts))}
+        return [(tail, key) for tail in tails if tail]
+
+# Shared index instance
+location_index = LocationIndex()
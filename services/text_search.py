@@ -0,0 +1,183 @@
+# services/text_search.py
+# SQLite FTS5 index over car locations and models
+
+import re
+
+from sqlalchemy.exc import OperationalError
+
+# Columns held in the full-text index
+SEARCH_COLUMNS = ('location', 'model')
+
+class CarSearchIndex:
+    """
+    Full-text index over cars.location and cars.model backed by an FTS5 table.
+
+    The index table stores its own copy of both columns keyed by car ID, so it
+    is updated explicitly whenever a listing is created, edited or deleted.
+    Databases without FTS5 fall back to LIKE matching.
+    """
+    TABLE = 'cars_fts'
+
+    def __init__(self):
+        """
+        Initialize the index in fallback mode until attached to an application.
+        """
+        self._enabled = False
+        self._fts = None
+
+    @property
+    def enabled(self):
+        """
+        Whether searches are served from the FTS5 table.
+
+        Returns:
+            True if the FTS5 table is in use, False for the LIKE fallback
+        """
+        return self._enabled
+
+    def init_app(self, app):
+        """
+        Create the FTS5 table if needed and rebuild it if it is out of date.
+        Must be called inside an application context.
+
+        Args:
+            app: The Flask application
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+
+        self._enabled = False
+        if db.engine.dialect.name != 'sqlite':
+            return
+
+        try:
+            db.session.execute(db.text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} "
+                f"USING fts5({', '.join(SEARCH_COLUMNS)}, prefix='2 3', tokenize='unicode61')"
+            ))
+            db.session.commit()
+        except OperationalError:
+            # SQLite build without FTS5
+            db.session.rollback()
+            return
+
+        self._fts = db.table(self.TABLE, db.column('rowid'), db.column(self.TABLE))
+        self._enabled = True
+
+        # Listings written by scripts (init_db.py, dbinit.py) bypass the routes
+        indexed = db.session.execute(db.text(f"SELECT count(*), max(rowid) FROM {self.TABLE}")).one()
+        stored = db.session.execute(db.text("SELECT count(*), max(id) FROM cars")).one()
+        if tuple(indexed) != tuple(stored):
+            self.rebuild()
+            db.session.commit()
+
+    def rebuild(self):
+        """
+        Repopulate the index from the cars table.
+        The caller is responsible for committing.
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+
+        if not self._enabled:
+            return
+
+        db.session.execute(db.text(f"DELETE FROM {self.TABLE}"))
+        db.session.execute(db.text(
+            f"INSERT INTO {self.TABLE} (rowid, {', '.join(SEARCH_COLUMNS)}) "
+            f"SELECT id, {', '.join(SEARCH_COLUMNS)} FROM cars"
+        ))
+
+    def index_car(self, car):
+        """
+        Add or refresh a car in the index.
+        The car must have been flushed so it has an ID; the caller commits.
+
+        Args:
+            car: The Car to index
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+
+        if not self._enabled:
+            return
+
+        db.session.execute(
+            db.text(f"DELETE FROM {self.TABLE} WHERE rowid = :car_id"),
+            {'car_id': car.id}
+        )
+        db.session.execute(
+            db.text(f"INSERT INTO {self.TABLE} (rowid, location, model) VALUES (:car_id, :location, :model)"),
+            {'car_id': car.id, 'location': car.location, 'model': car.model}
+        )
+
+    def remove_car(self, car_id):
+        """
+        Remove a car from the index. The caller commits.
+
+        Args:
+            car_id: The ID of the car to remove
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+
+        if not self._enabled:
+            return
+
+        db.session.execute(
+            db.text(f"DELETE FROM {self.TABLE} WHERE rowid = :car_id"),
+            {'car_id': car_id}
+        )
+
+    def match(self, text, columns=SEARCH_COLUMNS):
+        """
+        Build a filter matching cars whose columns contain every word in the text.
+        Each word also matches as a prefix, so "det" finds "Detroit".
+
+        Args:
+            text: The text typed by the user
+            columns: The columns to search (default: location and model)
+
+        Returns:
+            SQL expression for use in a Car query filter, or None if the text
+            contains no searchable words
+        """
+        # This import is placed here to avoid circular imports
+        from app import db
+        from models.car import Car
+
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+
+        if not self._enabled:
+            return db.and_(*[
+                db.or_(*[getattr(Car, column).ilike(f"%{token}%") for column in columns])
+                for token in tokens
+            ])
+
+        terms = ' AND '.join(f'"{token}"*' for token in tokens)
+        expression = f"{{{' '.join(columns)}}} : ({terms})"
+        matches = db.select(self._fts.c.rowid).where(
+            getattr(self._fts.c, self.TABLE).op('MATCH')(expression)
+        )
+        return Car.id.in_(matches)
+
+def tokenize(text):
+    """
+    Split search text into lowercase words.
+    Punctuation and FTS5 operators are dropped so user input is always a
+    plain word search.
+
+    Args:
+        text: The text to split
+
+    Returns:
+        List of words
+    """
+    if not text:
+        return []
+    return re.findall(r'\w+', text.lower())
+
+# Shared index instance
+car_search_index = CarSearchIndex()
@@ -125,4 +125,51 @@ document.addEventListener('DOMContentLoaded', function() {
         form.classList.add('was-validated');
       });
     });
-  });
\ No newline at end of file
+    
+    // Live updates: new messages and booking status changes pushed by the server
+    const streamUrl = document.body.dataset.eventStreamUrl;
+    const liveAlerts = document.getElementById('live-alerts');
+    const messageBadge = document.getElementById('live-message-badge');
+    
+    function showLiveAlert(text, link) {
+      const alert = document.createElement(link ? 'a' : 'div');
+      alert.className = 'alert alert-info';
+      alert.textContent = text;
+      if (link) {
+        alert.href = link;
+      }
+      liveAlerts.appendChild(alert);
+      setTimeout(() => {
+        alert.style.opacity = '0';
+        setTimeout(() => {
+          alert.remove();
+        }, 500);
+      }, 5000);
+    }
+    
+    if (streamUrl && window.EventSource && liveAlerts) {
+      const userId = Number(document.body.dataset.userId);
+      const events = new EventSource(streamUrl);
+      
+      events.addEventListener('new_message', function(e) {
+        const message = JSON.parse(e.data);
+        
+        // An open conversation page shows the message itself
+        const shown = new CustomEvent('driveshare:new-message', { detail: message, cancelable: true });
+        if (!document.dispatchEvent(shown) || Number(message.sender_id) === userId) {
+          return;
+        }
+        
+        if (messageBadge) {
+          messageBadge.textContent = Number(messageBadge.textContent || 0) + 1;
+          messageBadge.hidden = false;
+        }
+        showLiveAlert('You have a new message.', document.body.dataset.inboxUrl);
+      });
+      
+      events.addEventListener('booking_status', function(e) {
+        const booking = JSON.parse(e.data);
+        showLiveAlert(`Booking #${booking.booking_id} (${booking.car_name}) is now ${booking.status}.`);
+      });
+    }
+});
\ No newline at end of file